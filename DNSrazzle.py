@@ -38,11 +38,17 @@ import csv
 import os
 import signal
 import sys
-import time
 from progress.bar import Bar
 from dnsrazzle import IOUtil
-from dnsrazzle.DnsRazzle import DnsRazzle
-from dnsrazzle.IOUtil import print_error, print_good, print_status
+from dnsrazzle.BloomUtil import BloomFilter
+from dnsrazzle.CacheUtil import DnsCache, WhoisCache, WHOIS_CACHE_TTL_DEFAULT
+from dnsrazzle.DnsRazzle import DnsRazzle, generate_permutations, list_permutations, start_resolution, whois_domains, whois_targets
+from dnsrazzle.IOUtil import ProgressSink, print_error, print_good, print_status
+from dnsrazzle.ResolverUtil import NameserverPool, ResolverStats, DNS_CONCURRENCY_DEFAULT
+from dnsrazzle.StateUtil import RunState, write_delta_report, STATE_MAX_AGE_DEFAULT
+from dnsrazzle.WhoisUtil import WhoisScheduler
+from dnsrazzle.WordlistUtil import load_wordlist, KIND_DICTIONARY, KIND_TLD
+from dnsrazzle.ZoneUtil import ZoneIndex
 
 
 def main():
@@ -56,14 +62,28 @@ def main():
     parser.add_argument('--browser', type=str, dest='browser', default='chrome',
                         help='Specify browser to use with WebDriver. Default is "chrome", "firefox" is also supported.')
     parser.add_argument('-d', '--domain', type=str, dest='domain', help='Target domain or domain list.')
+    parser.add_argument('--bloom-filter', type=str, dest='bloom_filter', metavar='FILE', default=None,
+                        help='Bloom filter of registered names built with "python3 -m dnsrazzle.BloomUtil". Permutations it certainly does not contain are not looked up.')
     parser.add_argument('-D', '--dictionary', type=str, dest='dictionary', metavar='FILE', default=[],
                         help='Path to dictionary file to pass to DNSTwist to aid in domain permutation generation.')
+    parser.add_argument('--dns-concurrency', dest='dns_concurrency', type=int, default=DNS_CONCURRENCY_DEFAULT,
+                        help='Maximum number of DNS lookups in flight during permutation checks. Default is %d.' % DNS_CONCURRENCY_DEFAULT)
+    parser.add_argument('--dns-cache', type=str, dest='dns_cache', metavar='FILE', default=None,
+                        help='Path to an SQLite file caching DNS answers between runs. Only expired entries are queried again.')
+    parser.add_argument('--dns-cache-min-ttl', type=int, dest='dns_cache_min_ttl', metavar='SECONDS', default=0,
+                        help='Keep cached DNS answers for at least this many seconds, even if their TTL is shorter. Default is 0.')
+    parser.add_argument('--dns-hedge', type=float, dest='dns_hedge', metavar='PCT', default=0,
+                        help='Resend DNS queries that are slower than the p95 latency to a second nameserver, using at most PCT%% extra queries. Default is 0 (off).')
+    parser.add_argument('--zone-index', type=str, dest='zone_index', metavar='FILE', default=None,
+                        help='Index of delegated names built from zone files with "python3 -m dnsrazzle.ZoneUtil". Permutations under an indexed zone are only looked up if they are delegated.')
     parser.add_argument('-e', '--email', dest='email', action='store_true', default=False,
                         help='Tell DNSRazzle to email the reports when completed. Requires configuration in etc/mail_config.conf.')
     parser.add_argument('-f', '--file', type=str, dest='file', metavar='FILE', default=None,
                         help='Provide a file containing a list of domains to run DNSrazzle on.')
     parser.add_argument('-g', '--generate', dest='generate', action='store_true', default=False,
                         help='Do a dry run of DNSRazzle and just output permutated domain names.')
+    parser.add_argument('--max-permutations', dest='max_permutations', type=int, default=None, metavar='N',
+                        help='Look up at most N permutations over all domains, riskiest first.')
     parser.add_argument('-n', '--nmap', dest='nmap', action='store_true', default=False,
                         help='Perform nmap scan on discovered domains.')
     parser.add_argument('-N', '--nameservers', metavar='STRING', type=str, default='1.1.1.1,1.0.0.1',
@@ -72,12 +92,24 @@ def main():
                         help='Do not take screenshots of discovered domains. Only collect DNS and banner info.')
     parser.add_argument('--nowhois', dest='no_whois', action='store_true', default=False,
                         help='Do not run whois for discovered domains.')
+    parser.add_argument('--whois-cache', type=str, dest='whois_cache', metavar='FILE', default=None,
+                        help='Path to an SQLite file caching WHOIS results between runs, by registrable domain. A record is queried again once it expires or the DNS of its domain changes.')
+    parser.add_argument('--whois-cache-ttl', type=float, dest='whois_cache_ttl', metavar='DAYS', default=WHOIS_CACHE_TTL_DEFAULT,
+                        help='Days a cached WHOIS record is kept. Default is %d.' % WHOIS_CACHE_TTL_DEFAULT)
     parser.add_argument('-o', '--out-directory', type=str, dest='out_dir', default=None,
                         help='Absolute path of directory to output reports to. Will be created if doesn\'t exist.')
     parser.add_argument('--justTestLogoDetection', dest='justTestLogoDetection', action='store_true', default=False,
                         help='Test the process for 1 url only.')
     parser.add_argument('-r', '--recon', dest = 'recon', action = 'store_true', default = False,
                         help = 'Create dnsrecon report on discovered domains.')
+    parser.add_argument('--processes', dest='processes', type=int, default=None, metavar='N',
+                        help='Number of worker processes generating permutations when several domains are given. Default is the number of CPUs.')
+    parser.add_argument('--time-budget', dest='time_budget', type=float, default=None, metavar='SECONDS',
+                        help='Stop starting new DNS lookups after SECONDS, riskiest permutations first.')
+    parser.add_argument('--state-dir', type=str, dest='state_dir', metavar='DIR', default=None,
+                        help='Directory keeping the results of previous runs. WHOIS and screenshots are only redone for new or changed domains, and a delta report is written.')
+    parser.add_argument('--state-max-age', type=float, dest='state_max_age', metavar='DAYS', default=STATE_MAX_AGE_DEFAULT,
+                        help='Recheck unchanged domains in the state directory once their last check is this many days old. Default is %d.' % STATE_MAX_AGE_DEFAULT)
     parser.add_argument('-t', '--threads', dest='threads', type=int, default=10,
                         help='Number of threads to use in permutation checks, reverse lookups, forward lookups, brute force and SRV record enumeration.')
     parser.add_argument('--tld', type=str, dest='tld', metavar='FILE', default=[],
@@ -127,7 +159,11 @@ def main():
          domain_raw_list = []
          with open(arguments.file) as f:
             for item in f.read().splitlines():
-                domain_raw_list.append(item)
+                if item.strip():
+                    domain_raw_list.append(item.strip())
+         if not domain_raw_list:
+             print_error(f"No domains found in {arguments.file}")
+             sys.exit(1)
     else:
          print_error(f"You must specify either the -d or the -f option")
          sys.exit(1)
@@ -142,112 +178,143 @@ def main():
     if arguments.dictionary:
         if not os.path.exists(arguments.dictionary):
             parser.error('dictionary file not found: %s' % arguments.dictionary)
-        with open(arguments.dictionary) as f:
-            dictionary = set(f.read().splitlines())
-            dictionary = [x for x in dictionary if x.isalnum()]
+        try:
+            dictionary = load_wordlist(arguments.dictionary, KIND_DICTIONARY)
+        except ValueError as e:
+            parser.error(str(e))
 
     tld = []
     if arguments.tld:
         if not os.path.exists(arguments.tld):
             parser.error('dictionary file not found: %s' % arguments.tld)
-        with open(arguments.tld) as f:
-            tld = set(f.read().splitlines())
-            tld = [x for x in tld if x.isalpha()]
+        try:
+            tld = load_wordlist(arguments.tld, KIND_TLD)
+        except ValueError as e:
+            parser.error(str(e))
+
+    dns_cache = None
+    if arguments.dns_cache and not arguments.generate:
+        dns_cache = DnsCache(arguments.dns_cache, min_ttl=arguments.dns_cache_min_ttl)
+
+    nameserver_pool = NameserverPool(nameservers)
+    resolver_stats = ResolverStats()
+    zone_index = None
+    if arguments.zone_index:
+        if not os.path.exists(arguments.zone_index):
+            parser.error('zone index file not found: %s' % arguments.zone_index)
+        zone_index = ZoneIndex(arguments.zone_index)
+        print_status(f"Loaded zone index of {len(zone_index)} delegated names covering: {', '.join(sorted(zone_index.origins))}")
+    bloom_filter = None
+    if arguments.bloom_filter:
+        if not os.path.exists(arguments.bloom_filter):
+            parser.error('bloom filter file not found: %s' % arguments.bloom_filter)
+        bloom_filter = BloomFilter.load(arguments.bloom_filter)
+        print_status(f"Loaded bloom filter of {len(bloom_filter)} names covering: {', '.join(sorted(bloom_filter.origins))} "
+                     f"(false-positive rate {bloom_filter.false_positive_rate():.3%})")
 
     razzles: list[DnsRazzle] = []
-    if no_interactive:
-        print_status(f"Generating possible domain name impersonations…")
-    else:
-        bar = Bar(f'Generating possible domain name impersonations…', max=len(domain_raw_list))
+    captures = {}
     for entry in domain_raw_list:
         razzle = DnsRazzle(domain=str(entry), out_dir=out_dir, tld=tld, dictionary=dictionary, file=arguments.file,
-                useragent=useragent, debug=True, threads=threads, nmap=nmap, recon=recon, driver=driver,
-                nameservers=nameservers)
-        if not justTestLogoDetection:
-            razzle.generate_fuzzed_domains()
-        else:
-            razzle.domains = [{"domain-name": razzle.domain}]
+                useragent=useragent, debug=debug, threads=threads, nmap=nmap, recon=recon, driver=driver,
+                nameservers=nameservers, concurrency=arguments.dns_concurrency, dns_cache=dns_cache,
+                hedge_budget=arguments.dns_hedge / 100, nameserver_pool=nameserver_pool, resolver_stats=resolver_stats,
+                zone_index=zone_index, bloom_filter=bloom_filter, captures=captures)
         razzles.append(razzle)
-        if no_interactive:
-            print_status(f"Generated possible domain name impersonations for {razzle.domain}")
-        else:
-            bar.next()
-    if no_interactive:
-        print_good(f"Generated possible domain name impersonations for {len(domain_raw_list)} domains")
-    else:
-        bar.finish()
 
     if justPrintDomains:
-        for razzle in razzles:
-            for entry in razzle.domains[1:]:
-                print(entry['domain-name'])
+        for names in list_permutations(razzles, arguments.processes):
+            if names:
+                print(names)
         return
 
-    for razzle in razzles:
+    if justTestLogoDetection:
+        for razzle in razzles:
+            razzle.permutations = [{"fuzzer": "original*", "domain-name": razzle.domain}]
+            razzle.jobs_max = 1
+    else:
         if no_interactive:
-            print_status(f"Generating DNS lookup of possible domain permutations for {razzle.domain}…")
+            print_status(f"Generating possible domain name impersonations…")
         else:
-            bar = Bar(f'Running DNS lookup of possible domain permutations for {razzle.domain}…', max=len(razzle.domains)-1)
-        razzle.gendom_start()
-        print(f"Total permutations: {razzle.jobs_max}")
-        last_completed_jobs = 0
-        total_jobs = razzle.jobs_max
-        last_progress_time = time.time()
-        progress_interval = 60  # Seconds
-        total_timeouts = 0
-        first_time = True
-        while not razzle.jobs.empty() or first_time:
-            first_time = False
-            completed_jobs = razzle.jobs_max - razzle.jobs.qsize()
-            current_time = time.time()
+            bar = Bar(f'Generating possible domain name impersonations…', max=len(domain_raw_list))
+
+        def generated(razzle):
             if no_interactive:
-                if completed_jobs > last_completed_jobs and current_time - last_progress_time >= progress_interval:
-                    last_progress_time = current_time
-                    percentage = (completed_jobs / total_jobs) * 100
-                    timeout_errors = len(razzle.get_timeout_errors())
-                    percentate_timeouts = (timeout_errors / (completed_jobs - razzle.last_registered_completed_jobs)) * 100
-                    razzle.last_registered_completed_jobs = completed_jobs
-                    total_timeouts += timeout_errors
-                    print_status(f"DNS lookup progress: {completed_jobs}/{total_jobs} ({percentage:.1f}%). Timeout errors: {timeout_errors} ({percentate_timeouts:.1f}%)")
-                last_completed_jobs = completed_jobs
+                print_status(f"Generated possible domain name impersonations for {razzle.domain}")
             else:
-                bar.goto(completed_jobs)
-            time.sleep(0.5)
+                bar.next()
+        generate_permutations(razzles, arguments.processes, generated)
         if no_interactive:
-            percentage = 100
-            percentage_timeouts = (razzle.total_timeout_errors / total_jobs) * 100
-            print_status(f"DNS lookup progress: {razzle.jobs_max}/{razzle.jobs_max} ({percentage:.1f}%). Timeout errors: {total_timeouts} ({percentage_timeouts:.1f}%)")
-            print_good(f"Generated DNS lookup of possible domain permutations for {razzle.domain}")
+            print_good(f"Generated possible domain name impersonations for {len(domain_raw_list)} domains")
         else:
-            bar.goto(bar.max)
             bar.finish()
-        if debug:
+
+    def dns_detail(completed_jobs):
+        timeouts, queries = resolver_stats.timeouts, resolver_stats.queries
+        percentage_timeouts = (timeouts / queries) * 100 if queries else 0
+        return f"Timeout errors: {timeouts} ({percentage_timeouts:.1f}% of queries)"
+    total_jobs = sum(razzle.jobs_max for razzle in razzles)
+    progress = ProgressSink(f'Running DNS lookup of possible domain permutations for {len(razzles)} domains…', total_jobs,
+                            interactive=not no_interactive, detail=dns_detail, label="DNS lookup progress:")
+    worker = start_resolution(razzles, progress, arguments.max_permutations, arguments.time_budget)
+    progress.wait()
+    if not worker.jobs.stopped:
+        print(f"Total permutations: {sum(razzle.jobs_max for razzle in razzles)}")
+    if no_interactive:
+        print_good(f"Generated DNS lookup of possible domain permutations for {len(razzles)} domains")
+    if worker.jobs.stopped:
+        print_status(f"Stopped DNS lookups at the {worker.jobs.stopped} after {worker.jobs.handed_out} permutations, "
+                     f"the remaining, lower-risk permutations were not checked")
+    if worker.jobs.duplicates:
+        print_status(f"Resolved {worker.jobs.duplicates} repeated permutations, of one domain or shared by several, only once")
+    if worker.skipped + worker.jobs.skipped:
+        print_status(f"Skipped {worker.skipped + worker.jobs.skipped} lookups whose base name or TLD does not exist")
+    if worker.zone_skipped:
+        print_status(f"Skipped {worker.zone_skipped} lookups of names not delegated in the zone index")
+    if worker.bloom_skipped:
+        print_status(f"Skipped {worker.bloom_skipped} lookups of names absent from the bloom filter")
+    for line in nameserver_pool.summary():
+        print_status(f"Nameserver {line}")
+    for line in resolver_stats.summary():
+        print_status(f"DNS responses from {line}")
+    if arguments.dns_hedge:
+        print_status(f"Hedged {worker.resolver.hedges} of {worker.resolver.queries} DNS queries, "
+                     f"the hedge answered first {worker.resolver.hedge_wins} times")
+    if debug:
+        for razzle in razzles:
             print_good(f"Generated domains dictionary: \n{razzle.domains}")
 
+    if dns_cache is not None:
+        print_status(f"DNS cache: {dns_cache.hits} answers reused, {dns_cache.misses} queried")
+        dns_cache.close()
+
+    state = None
+    if arguments.state_dir:
+        state = RunState(arguments.state_dir, max_age=arguments.state_max_age * 86400)
+        counts = state.compare(razzles, worker.undecided)
+        print_status(f"Compared with the state in {arguments.state_dir}: {counts.get('new', 0)} new, "
+                     f"{counts.get('changed', 0)} changed, {counts.get('stale', 0)} due for a recheck and "
+                     f"{counts.get('unchanged', 0)} unchanged domains")
+
     if not no_whois:
-        for razzle in razzles:
-            if no_interactive:
-                print_status(f"Running WHOIS queries on discovered domains for {razzle.domain}…")
-                razzle.completed_domains = 0
-                razzle.total_domains = len(razzle.domains)
-                last_progress_time = time.time()
-                progress_interval = 60  # Seconds
-                def progress_callback():
-                    nonlocal last_progress_time
-                    current_time = time.time()
-                    razzle.completed_domains += 1
-                    if current_time - last_progress_time >= progress_interval:
-                        percentage = (razzle.completed_domains / razzle.total_domains) * 100
-                        print_status(f"WHOIS queries progress: {razzle.completed_domains}/{razzle.total_domains} ({percentage:.0f}%)")
-                        last_progress_time = current_time
-                razzle.whois(progress_callback)
-                percentage = 100
-                print_status(f"WHOIS queries progress: {razzle.total_domains}/{razzle.total_domains} ({percentage:.0f}%)")
-                print_good(f"Generated WHOIS queries for {razzle.domain}")
-            else:
-                pBar = Bar(f'Running WHOIS queries on discovered domains for {razzle.domain}…', max=len(razzle.domains))
-                razzle.whois(pBar.next)
-                pBar.finish()
+        restored = state.restore_whois(razzles) if state is not None else set()
+        if restored:
+            print_status(f"Reusing the WHOIS data of {len(restored)} unchanged domains")
+        targets = whois_targets(razzles, restored)
+        progress = ProgressSink(f'Running WHOIS queries on discovered domains for {len(razzles)} domains…', len(targets),
+                                interactive=not no_interactive, label="WHOIS queries progress:")
+        whois_cache = WhoisCache(arguments.whois_cache, ttl=arguments.whois_cache_ttl * 86400) if arguments.whois_cache else None
+        whois_scheduler = WhoisScheduler()
+        whois_domains(razzles, threads, progress.advance, skip=restored, cache=whois_cache, scheduler=whois_scheduler)
+        progress.finish()
+        progress.wait()
+        for line in whois_scheduler.summary():
+            print_status(f"WHOIS registry {line}")
+        if whois_cache is not None:
+            print_status(f"WHOIS cache: {whois_cache.hits} records reused, {whois_cache.misses} queried")
+            whois_cache.close()
+        if no_interactive:
+            print_good(f"Generated WHOIS queries for {len(razzles)} domains")
 
     print_status("Processing domain information")
     with open(out_dir + '/discovered-domains.csv', 'w') as f:
@@ -258,11 +325,23 @@ def main():
             if not header_written:
                 writer.writeheader()
                 header_written = True
-            for d in razzle.domains:
-                if (justTestLogoDetection or d['domain-name'] != razzle.domain) and 'dns-a' in d.keys() and '!ServFail' not in d['dns-a']:
+            for d in razzle.resolved_domains():
+                if justTestLogoDetection or d['domain-name'] != razzle.domain:
                     writer.writerow(d)
                     counter += 1
     print_good(f"{counter} discovered domains written to {out_dir}/discovered-domains.csv")
+    if len(razzles) > 1:
+        with open(out_dir + '/domain-provenance.csv', 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(['domain-name', 'brand', 'fuzzer'])
+            written = set()
+            for razzle in razzles:
+                for d in razzle.resolved_domains():
+                    if d['domain-name'] != razzle.domain and d['domain-name'] not in written and d.sources:
+                        written.add(d['domain-name'])
+                        for brand, fuzzer in d.sources:
+                            writer.writerow([d['domain-name'], brand, fuzzer])
+        print_good(f"Brands and fuzzers that generated each discovered domain written to {out_dir}/domain-provenance.csv")
 
     if arguments.yolo and not no_screenshot:
         if not os.path.exists(arguments.yolo):
@@ -300,7 +379,12 @@ def main():
                 print_status(f"{siteB} is {adj} {siteA} with a score of {rounded_score}. {logo_present}")
                 with open(file=razzle.out_dir + "/domain_similarity.csv", mode="a") as f:
                     f.write(f"{siteA},{siteB},{rounded_score},{logo_present}\n")
-            razzle.check_domains(check_domain_callback, browser=arguments.browser)
+            progress = ProgressSink(f'Collecting web screenshots for {razzle.domain}…', len(razzle.resolved_domains()),
+                                    interactive=not no_interactive, label="Screenshot progress:")
+            razzle.check_domains(check_domain_callback, browser=arguments.browser, progress=progress,
+                                 reuse=state.restore_screenshot if state is not None else None)
+            progress.finish()
+            progress.wait()
         print_good(f"Visual analysis saved to {out_dir}/domain_similarity.csv")
 
     if arguments.blocklist:
@@ -315,5 +399,12 @@ def main():
                                     f.write("%s,%s" % (ip, domain['domain-name']))
         print_good(f"Blocklist saved to {out_dir}/blocklist.csv")
 
+    if state is not None:
+        delta = state.update(razzles, complete=not worker.jobs.stopped, whois=not no_whois, screenshots=not no_screenshot,
+                             undecided=worker.undecided)
+        state.close()
+        write_delta_report(delta, out_dir + '/delta-report.csv')
+        print_good(f"{len(delta)} new, changed or gone domains since the last run written to {out_dir}/delta-report.csv")
+
 if __name__ == "__main__":
     main()
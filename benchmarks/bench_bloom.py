@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Build a bloom filter from a synthetic zone file and measure load time, lookup latency and the
+false-positive rate against names that were never added.
+
+    python3 -m benchmarks.bench_bloom --names 1000000
+'''
+
+import argparse
+import os
+import tempfile
+import time
+from dnsrazzle.BloomUtil import ERROR_RATE_DEFAULT, BloomFilter, build_bloom_filter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--names', type=int, default=1000000, help='Number of delegations in the synthetic zone.')
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--error-rate', type=float, default=ERROR_RATE_DEFAULT)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zone = os.path.join(tmp, 'example.zone')
+        with open(zone, 'w') as f:
+            f.write('$ORIGIN example.\n@ IN SOA ns.example. hostmaster.example. 1 1800 900 604800 86400\n')
+            for i in range(arguments.names):
+                f.write(f'name{i:08d} NS ns1.name{i:08d}\n')
+
+        filter_path = os.path.join(tmp, 'example.bloom')
+        start = time.perf_counter()
+        build_bloom_filter([zone], filter_path, error_rate=arguments.error_rate)
+        print(f'built filter of {arguments.names} names in {time.perf_counter() - start:.2f}s '
+              f'({os.path.getsize(filter_path) / 1e6:.1f} MB)')
+
+        start = time.perf_counter()
+        bloom = BloomFilter.load(filter_path)
+        print(f'loaded filter in {(time.perf_counter() - start) * 1e3:.2f}ms, '
+              f'estimated false-positive rate {bloom.false_positive_rate():.4%}')
+
+        absent = [f'absent{i:08d}.example' for i in range(arguments.lookups)]
+        start = time.perf_counter()
+        false_positives = sum(1 for name in absent if bloom.is_delegated(name))
+        elapsed = time.perf_counter() - start
+        print(f'{arguments.lookups} lookups of absent names in {elapsed:.2f}s: '
+              f'{elapsed / arguments.lookups * 1e6:.1f}us per lookup, '
+              f'measured false-positive rate {false_positives / arguments.lookups:.4%}')
+        missing = sum(1 for i in range(0, arguments.names, max(arguments.names // 10000, 1))
+                      if not bloom.is_delegated(f'name{i:08d}.example'))
+        print(f'added names reported absent: {missing}')
+        bloom.close()
+
+
+if __name__ == '__main__':
+    main()
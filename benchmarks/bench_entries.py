@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compare the memory held by domain entries stored as dicts and as IOUtil.DomainEntry records,
+and check that both write the same discovered-domains CSV.
+
+    python3 -m benchmarks.bench_entries --domain acme.com --tlds 300
+'''
+
+import argparse
+import csv
+import io
+import itertools
+import string
+import tracemalloc
+from dnsrazzle import IOUtil
+from dnsrazzle.DnsRazzle import DnsRazzle
+from dnsrazzle.IOUtil import DomainEntry
+
+
+def measure(entries):
+    tracemalloc.start()
+    kept = []
+    for i, entry in enumerate(entries):
+        # roughly one in a hundred permutations resolves
+        if i % 100 == 0:
+            entry['dns-a'] = ['192.0.2.1']
+            entry['dns-ns'] = ['ns1.example.net', 'ns2.example.net']
+        kept.append(entry)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, size
+
+
+def write_csv(entries):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, IOUtil.domain_entry_keys)
+    writer.writeheader()
+    for entry in entries:
+        if 'dns-a' in entry:
+            writer.writerow(entry)
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--domain', default='acme.com')
+    parser.add_argument('--tlds', type=int, default=300, help='Number of synthetic TLDs to swap in.')
+    arguments = parser.parse_args()
+
+    tld = [''.join(letters) for letters in itertools.product(string.ascii_lowercase, repeat=3)][:arguments.tlds]
+    razzle = DnsRazzle(arguments.domain, None, tld, [], None, None, False, 1, False, False, None)
+    razzle.generate_fuzzed_domains()
+    names = [(entry['fuzzer'], entry['domain-name']) for entry in razzle.iter_domains()]
+
+    dicts, dict_size = measure({'fuzzer': fuzzer, 'domain-name': name} for fuzzer, name in names)
+    records, record_size = measure(DomainEntry(fuzzer, name) for fuzzer, name in names)
+    print(f'{len(names)} entries: dicts {dict_size / 1e6:.1f} MB ({dict_size / len(names):.0f} B each), '
+          f'DomainEntry {record_size / 1e6:.1f} MB ({record_size / len(names):.0f} B each), '
+          f'{1 - record_size / dict_size:.0%} less')
+    print('CSV output identical:', write_csv(dicts) == write_csv(records))
+
+
+if __name__ == '__main__':
+    main()
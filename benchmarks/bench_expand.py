@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Time the www./tld-swap expansion of FuzzUtil.expand_domains against encoding and validating
+every swapped name in full, as DomainFuzz's postprocess does, and check both yield the same
+names. Both split names at their public suffix and drop names that cannot be registered
+(see SuffixUtil.SuffixIndex). By default the TLDs are every top-level label of the public suffix list bundled with
+the tld package, filtered like DNSRazzle filters a --tld file.
+
+    python3 -m benchmarks.bench_expand --domain acme.com --profile
+'''
+
+import argparse
+import cProfile
+import os
+import pstats
+import time
+import dnstwist
+import tld as tld_package
+from dnsrazzle.FuzzUtil import expand_domains, fuzz_domain, split_suffix, suffix_index
+from dnsrazzle.WordlistUtil import valid_words, KIND_TLD
+
+
+def psl_tlds():
+    path = os.path.join(os.path.dirname(tld_package.__file__), 'res', 'effective_tld_names.dat.txt')
+    with open(path, encoding='utf-8') as f:
+        labels = {line.strip() for line in f if line.strip() and not line.startswith('//') and '.' not in line}
+    return [x for x in labels if x.isalpha()]
+
+
+def expand_full(permutations, tld):
+    seen = set()
+    index = suffix_index()
+
+    def unseen(name):
+        try:
+            name = dnstwist.idna.encode(name).decode().lower()
+        except Exception:
+            return None
+        if dnstwist.VALID_FQDN_REGEX.match(name) and name not in seen and index.is_registrable(name):
+            seen.add(name)
+            return name
+        return None
+
+    def is_suffix(swap):
+        try:
+            return index.is_suffix(dnstwist.idna.encode(swap).decode().lower())
+        except Exception:
+            return False
+
+    valid = []
+    for entry in permutations:
+        name = unseen(entry['domain-name'])
+        if name:
+            valid.append(name)
+            yield name
+    for name in valid:
+        yield 'www.' + name
+        for swap in tld:
+            new_domain = unseen(split_suffix(name)[0] + '.' + swap) if is_suffix(swap) else None
+            if new_domain:
+                yield new_domain
+                yield 'www.' + new_domain
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--domain', default='acme.com')
+    parser.add_argument('--tld', metavar='FILE', help='TLD file to use instead of the public suffix list.')
+    parser.add_argument('--profile', action='store_true', help='Print the top functions of a cProfile run of each.')
+    arguments = parser.parse_args()
+
+    if arguments.tld:
+        with open(arguments.tld) as f:
+            tld = valid_words(f.read().splitlines(), KIND_TLD)
+    else:
+        tld = psl_tlds()
+    permutations = fuzz_domain(arguments.domain, [], tld)
+    print(f'{len(permutations)} permutations of {arguments.domain} x {len(tld)} TLDs')
+
+    results = {}
+    for label, expand in (('full encode', lambda: expand_full(permutations, tld)),
+                          ('expand_domains', lambda: (entry['domain-name'] for entry in expand_domains(permutations, tld)))):
+        start = time.perf_counter()
+        names = set(expand())
+        elapsed = time.perf_counter() - start
+        results[label] = (names, elapsed)
+        print(f'{label:>15}: {len(names)} names in {elapsed:.2f}s ({elapsed / len(names) * 1e6:.2f}us per name)')
+        if arguments.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            for _ in expand():
+                pass
+            profiler.disable()
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(8)
+    (full, full_time), (fast, fast_time) = results.values()
+    print(f'same names: {full == fast}, {full_time / fast_time:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compare dnstwist's DomainFuzz.__homoglyph with FuzzUtil.homoglyphs on brand names of increasing
+length, checking that both return the same names.
+
+    python3 -m benchmarks.bench_homoglyph --lengths 4 8 12 16 20
+'''
+
+import argparse
+import random
+import string
+import time
+import dnstwist
+from dnsrazzle.FuzzUtil import homoglyphs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lengths', type=int, nargs='+', default=[4, 8, 12, 16, 20])
+    parser.add_argument('--seed', type=int, default=1)
+    arguments = parser.parse_args()
+
+    random.seed(arguments.seed)
+    print(f'{"length":>6} {"names":>8} {"dnstwist":>10} {"homoglyphs":>11} {"speedup":>8}  same')
+    for length in arguments.lengths:
+        brand = ''.join(random.choice(string.ascii_lowercase) for _ in range(length))
+        fuzz = dnstwist.DomainFuzz(brand + '.com')
+        start = time.perf_counter()
+        expected = set(getattr(fuzz, '_DomainFuzz__homoglyph')())
+        original = time.perf_counter() - start
+        start = time.perf_counter()
+        result = set(homoglyphs(brand))
+        fast = time.perf_counter() - start
+        print(f'{length:>6} {len(result):>8} {original:>9.3f}s {fast:>10.3f}s {original / fast:>7.1f}x  {result == expected}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Measure resolution throughput (queries/second) against the local stub DNS server.
+
+    python3 -m benchmarks.bench_resolver --names 20000 --concurrency 1000
+
+Pass --cache FILE and run it twice to see how many queries a warm DNS cache saves.
+'''
+
+import argparse
+import queue
+import time
+from benchmarks.stub_dns_server import StubDnsServer
+from dnsrazzle import WireUtil
+from dnsrazzle.CacheUtil import DnsCache
+from dnsrazzle.ResolverUtil import ResolverThread
+
+
+def make_records(names, registered_ratio):
+    records = {}
+    step = max(1, int(1 / registered_ratio)) if registered_ratio else 0
+    for i, name in enumerate(names):
+        if step and i % step == 0:
+            records[name] = {
+                WireUtil.TYPE_NS: ['ns1.' + name],
+                WireUtil.TYPE_A: ['192.0.2.%d' % (i % 250 + 1)],
+                WireUtil.TYPE_MX: ['10 mail.' + name],
+            }
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--names', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--registered', type=float, default=0.05, help='Fraction of names that exist.')
+    parser.add_argument('--cache', type=str, default=None, help='Path to a DNS cache file.')
+    parser.add_argument('--delay', type=float, default=0.0, help='Artificial server latency in seconds.')
+    arguments = parser.parse_args()
+
+    names = ['bench%06d.example' % i for i in range(arguments.names)]
+    with StubDnsServer(make_records(names, arguments.registered), delay=arguments.delay) as server:
+        jobs = queue.Queue()
+        for name in names:
+            jobs.put({'fuzzer': 'bench', 'domain-name': name})
+        cache = DnsCache(arguments.cache) if arguments.cache else None
+        worker = ResolverThread(jobs, ['127.0.0.1'], concurrency=arguments.concurrency, port=server.port, cache=cache)
+        start = time.perf_counter()
+        worker.start()
+        worker.join()
+        elapsed = time.perf_counter() - start
+        print(f'{arguments.names} names, {server.queries} queries in {elapsed:.2f}s: '
+              f'{arguments.names / elapsed:.0f} names/s, {server.queries / elapsed:.0f} queries/s')
+        if cache is not None:
+            print(f'cache: {cache.hits} hits, {cache.misses} misses')
+            cache.close()
+
+
+if __name__ == '__main__':
+    main()
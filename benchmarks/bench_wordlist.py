@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compare loading a -D dictionary from its text file with loading the compiled word list, and
+the size each is pickled to when handed to a worker process.
+
+    python3 -m benchmarks.bench_wordlist --dictionary dictionaries/subdomains-top1mil.txt
+'''
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+from dnsrazzle.WordlistUtil import KIND_DICTIONARY, compile_wordlist, load_wordlist
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dictionary', default='dictionaries/subdomains-top1mil.txt')
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compiled = os.path.join(tmp, 'dictionary.drz')
+        start = time.perf_counter()
+        compile_wordlist(arguments.dictionary, compiled, KIND_DICTIONARY).close()
+        print(f'compiled {arguments.dictionary} in {(time.perf_counter() - start) * 1e3:.1f}ms '
+              f'({os.path.getsize(compiled) / 1e6:.1f} MB)')
+
+        for label, path in (('text', arguments.dictionary), ('compiled', compiled)):
+            start = time.perf_counter()
+            for _ in range(arguments.repeat):
+                words = load_wordlist(path, KIND_DICTIONARY)
+            load = (time.perf_counter() - start) / arguments.repeat
+            start = time.perf_counter()
+            count = sum(1 for _ in words)
+            iterate = time.perf_counter() - start
+            print(f'{label}: {count} words, loaded in {load * 1e3:.2f}ms, iterated in {iterate * 1e3:.1f}ms, '
+                  f'pickled to {len(pickle.dumps(words))} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Build a zone index from a synthetic zone file and measure lookup latency.
+
+    python3 -m benchmarks.bench_zone_index --names 1000000
+'''
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from dnsrazzle.ZoneUtil import ZoneIndex, build_zone_index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--names', type=int, default=1000000, help='Number of delegations in the synthetic zone.')
+    parser.add_argument('--lookups', type=int, default=100000)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zone = os.path.join(tmp, 'example.zone')
+        with open(zone, 'w') as f:
+            f.write('$ORIGIN example.\n@ IN SOA ns.example. hostmaster.example. 1 1800 900 604800 86400\n')
+            for i in range(arguments.names):
+                f.write(f'name{i:08d} NS ns1.name{i:08d}\n')
+
+        index_path = os.path.join(tmp, 'example.idx')
+        start = time.perf_counter()
+        build_zone_index([zone], index_path)
+        print(f'built index of {arguments.names} names in {time.perf_counter() - start:.2f}s '
+              f'({os.path.getsize(index_path) / 1e6:.1f} MB)')
+
+        start = time.perf_counter()
+        index = ZoneIndex(index_path)
+        print(f'opened index in {(time.perf_counter() - start) * 1e3:.2f}ms')
+
+        names = [f'name{random.randrange(arguments.names * 2):08d}.example' for _ in range(arguments.lookups)]
+        start = time.perf_counter()
+        found = sum(1 for name in names if index.is_delegated(name))
+        elapsed = time.perf_counter() - start
+        print(f'{arguments.lookups} lookups ({found} delegated) in {elapsed:.2f}s: '
+              f'{elapsed / arguments.lookups * 1e6:.1f}us per lookup')
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Stand-in DNS server for exercising the dnsrazzle resolver offline.
+
+Answers UDP and TCP queries on a local port from an in-memory record table. Names missing from
+the table get NXDOMAIN, names in `truncate` always get a truncated UDP answer (forcing the TCP
+retry), and `delay` adds a fixed latency to every UDP answer.
+
+    records = {'example.com': {TYPE_A: ['93.184.216.34'], TYPE_NS: ['a.iana-servers.net']}}
+    with StubDnsServer(records) as server:
+        resolver = PipelinedResolver(['127.0.0.1'], port=server.port)
+'''
+
+import asyncio
+import socket
+import struct
+import threading
+from dnsrazzle import WireUtil
+from dnsrazzle.WireUtil import Record, WireError
+
+
+SOA_DEFAULT = 'ns.stub.invalid hostmaster.stub.invalid 1 3600 600 86400 300'
+
+
+class StubProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+
+    def datagram_received(self, data, addr):
+        self.server.queries += 1
+        if self.server.delay:
+            asyncio.get_running_loop().call_later(self.server.delay, self.reply, data, addr)
+        else:
+            self.reply(data, addr)
+
+    def reply(self, data, addr):
+        response = self.server.answer(data, udp=True)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+
+class StubDnsServer():
+    def __init__(self, records=None, host='127.0.0.1', port=0, truncate=(), delay=0.0, rcodes=None, ttl=300):
+        self.records = records or {}
+        self.host = host
+        self.port = port
+        self.truncate = set(truncate)
+        self.delay = delay
+        self.rcodes = rcodes or {}
+        self.ttl = ttl
+        self.queries = 0
+        self.loop = None
+        self.thread = None
+        self.udp = None
+        self.tcp = None
+        self.started = threading.Event()
+
+    def answer(self, data, udp):
+        try:
+            qid, _, qname, qtype = WireUtil.parse_query(data)
+        except (WireError, struct.error):
+            return None
+        if qname in self.rcodes:
+            return WireUtil.build_response(qid, qname, qtype, rcode=self.rcodes[qname])
+        if udp and qname in self.truncate:
+            return WireUtil.build_response(qid, qname, qtype, truncated=True)
+        soa = [Record(qname.split('.', 1)[-1], WireUtil.TYPE_SOA, self.ttl, SOA_DEFAULT)]
+        if qname not in self.records:
+            return WireUtil.build_response(qid, qname, qtype, rcode=WireUtil.RCODE_NXDOMAIN, authority=soa)
+        answer = [Record(qname, qtype, self.ttl, value) for value in self.records[qname].get(qtype, [])]
+        return WireUtil.build_response(qid, qname, qtype, answer=answer, authority=() if answer else soa)
+
+    async def handle_tcp(self, reader, writer):
+        try:
+            while True:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+                self.queries += 1
+                response = self.answer(await reader.readexactly(length), udp=False)
+                if response is None:
+                    break
+                writer.write(struct.pack('!H', len(response)) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.udp, _ = await loop.create_datagram_endpoint(lambda: StubProtocol(self), local_addr=(self.host, self.port))
+        self.port = self.udp.get_extra_info('sockname')[1]
+        self.tcp = await asyncio.start_server(self.handle_tcp, self.host, self.port)
+
+    def close(self):
+        if self.udp is not None:
+            self.udp.close()
+        if self.tcp is not None:
+            self.tcp.close()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.start())
+        self.started.set()
+        self.loop.run_forever()
+        self.close()
+        self.loop.close()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
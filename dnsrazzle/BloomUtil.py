@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import argparse
+import csv
+import hashlib
+import math
+import mmap
+import os
+import struct
+from .IOUtil import print_good, print_status
+from .ZoneUtil import read_delegations, registered_name
+
+
+BLOOM_MAGIC = b'DRZBLM1\n'
+BLOOM_HEADER = struct.Struct('<QQQQQ')
+ERROR_RATE_DEFAULT = 0.001
+# set bits of every byte value; int.bit_count() needs Python 3.10
+POPCOUNT = bytes(bin(i).count('1') for i in range(256))
+
+
+def bloom_size(count, error_rate):
+    '''
+    Number of bits and hash functions for a filter holding `count` names at `error_rate`.
+    '''
+    count = max(count, 1)
+    bits = max(int(math.ceil(-count * math.log(error_rate) / math.log(2) ** 2)), 64)
+    hashes = max(int(round(bits / count * math.log(2))), 1)
+    return bits, hashes
+
+
+def bit_positions(name, bits, hashes):
+    digest = hashlib.blake2b(name.encode('ascii', 'ignore'), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def read_results(path):
+    '''
+    Yield the domain names of a discovered-domains.csv written by a previous run, without the
+    www. of 'www prefix' permutations.
+    '''
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            name = (row.get('domain-name') or '').strip().lower().rstrip('.')
+            if name.startswith('www.'):
+                name = name[4:]
+            if name:
+                yield name
+
+
+def read_sources(zone_files, result_files):
+    for zone_file in zone_files:
+        previous = None
+        for origin, name in read_delegations(zone_file):
+            # NS records of one delegation are consecutive, count the owner once
+            if name != previous:
+                previous = name
+                yield origin, name
+    for result_file in result_files:
+        for name in read_results(result_file):
+            yield None, name
+
+
+def build_bloom_filter(zone_files, out_path, result_files=(), covers=(), error_rate=ERROR_RATE_DEFAULT):
+    '''
+    Build a Bloom filter of every name delegated in `zone_files` or listed in the
+    discovered-domains.csv `result_files` of previous runs. The zones of `zone_files`, plus
+    `covers` (e.g. for zone files without $ORIGIN), are recorded as the zones the filter speaks
+    for. Results are added as the name delegated from the zone covering them, the one
+    is_delegated() looks up, and results outside those zones are left out: a name missing
+    from an old run may have been registered since. The sources are read twice, once to size
+    the filter and once to fill it. Returns the filter.
+    '''
+    if covers and not zone_files:
+        raise ValueError('covers needs zone files, previous results alone cannot rule out a name')
+    print_status(f"Counting names in {len(zone_files) + len(result_files)} source files")
+    count = sum(1 for _ in read_sources(zone_files, result_files))
+    bits, hashes = bloom_size(count, error_rate)
+    bloom = BloomFilter(bytearray((bits + 7) // 8), bits, hashes)
+    bloom.origins.update(origin.lower().strip('.') for origin in covers)
+    print_status(f"Adding {count} names to a filter of {bits} bits with {hashes} hashes")
+    for origin, name in read_sources(zone_files, result_files):
+        if origin is not None:
+            bloom.origins.add(origin)
+        else:
+            # zone files come first, so every covered zone is known by now
+            name = registered_name(name, bloom.origins)
+            if name is None:
+                continue
+        bloom.add(name)
+    bloom.save(out_path)
+    return bloom
+
+
+class BloomFilter():
+    '''
+    Bloom filter of registered names. `data` is a bytearray while building and a read-only mmap
+    of the file written by save() once loaded, so opening even a filter of a whole .com zone
+    takes milliseconds. A name under one of `origins` that the filter does not contain is
+    certainly not delegated; one it does contain is delegated or a false positive.
+    '''
+    def __init__(self, data, bits, hashes, count=0, set_bits=0, origins=None, offset=0):
+        self.data = data
+        self.bits = bits
+        self.hashes = hashes
+        self.count = count
+        self.set_bits = set_bits
+        self.origins = origins if origins is not None else set()
+        self.offset = offset
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(BLOOM_MAGIC)] != BLOOM_MAGIC:
+            raise ValueError(f'{path} is not a dnsrazzle bloom filter')
+        bits, hashes, count, set_bits, origins_length = BLOOM_HEADER.unpack_from(data, len(BLOOM_MAGIC))
+        origins_start = len(BLOOM_MAGIC) + BLOOM_HEADER.size
+        origins = data[origins_start:origins_start + origins_length].decode('ascii')
+        return cls(data, bits, hashes, count, set_bits, set(origins.split('\n')) if origins else set(),
+                   origins_start + origins_length)
+
+    def add(self, name):
+        for position in bit_positions(name, self.bits, self.hashes):
+            self.data[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, name):
+        data = self.data
+        offset = self.offset
+        for position in bit_positions(name, self.bits, self.hashes):
+            if not data[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def false_positive_rate(self):
+        '''
+        Chance that a name which was never added is reported as present, from the share of bits
+        set when the filter was written.
+        '''
+        return (self.set_bits / self.bits) ** self.hashes if self.bits else 1.0
+
+    def is_delegated(self, name):
+        '''
+        False when `name` is under a covered zone and certainly not delegated, True when it may be,
+        None when the filter cannot tell.
+        '''
+        registered = registered_name(name, self.origins)
+        if registered is None:
+            return None
+        return registered in self
+
+    def save(self, path):
+        self.set_bits = 0
+        for start in range(0, len(self.data), 1 << 20):
+            self.set_bits += sum(self.data[start:start + (1 << 20)].translate(POPCOUNT))
+        origins = '\n'.join(sorted(self.origins)).encode('ascii')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(BLOOM_MAGIC)
+            f.write(BLOOM_HEADER.pack(self.bits, self.hashes, self.count, self.set_bits, len(origins)))
+            f.write(origins)
+            f.write(self.data)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a dnsrazzle bloom filter of registered names.')
+    parser.add_argument('filter', help='Path of the filter file to write.')
+    parser.add_argument('zone_files', nargs='*', metavar='ZONE_FILE', help='Zone files to read, optionally gzip compressed.')
+    parser.add_argument('--results', nargs='+', metavar='CSV', default=[],
+                        help='discovered-domains.csv files of previous runs whose names under the zones of the zone files are added to the filter.')
+    parser.add_argument('--covers', nargs='+', metavar='ZONE', default=[],
+                        help='Zones the zone files are complete for besides their $ORIGIN, e.g. for zone files without one.')
+    parser.add_argument('--error-rate', type=float, default=ERROR_RATE_DEFAULT,
+                        help=f'Target false-positive rate (default: {ERROR_RATE_DEFAULT})')
+    arguments = parser.parse_args()
+    if not arguments.zone_files:
+        parser.error('at least one zone file is required, --results only adds names under its zones')
+    if not 0 < arguments.error_rate < 1:
+        parser.error('--error-rate must be between 0 and 1')
+    bloom = build_bloom_filter(arguments.zone_files, arguments.filter, arguments.results, arguments.covers, arguments.error_rate)
+    print_good(f"Wrote {len(bloom)} names to {arguments.filter} ({bloom.bits // 8 / 1e6:.1f} MB, "
+               f"{bloom.hashes} hashes, false-positive rate {bloom.false_positive_rate():.3%})")
+
+
+if __name__ == '__main__':
+    main()
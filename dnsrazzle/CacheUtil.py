@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import json
+import sqlite3
+import threading
+import time
+
+
+STATUS_ANSWER = 'answer'
+STATUS_NOANSWER = 'noanswer'
+STATUS_NXDOMAIN = 'nxdomain'
+
+
+class DnsCache():
+    '''
+    On-disk cache of DNS results shared between runs, keyed by name and record type. Positive
+    answers expire with the smallest TTL of the answer records, negative answers (NXDOMAIN and
+    empty answers) with the SOA minimum from the authority section. `min_ttl` sets a floor on
+    how long any entry is kept.
+    '''
+    def __init__(self, path, min_ttl=0):
+        self.path = path
+        self.min_ttl = min_ttl
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS dns ('
+                        'name TEXT NOT NULL, rdtype INTEGER NOT NULL, status TEXT NOT NULL, '
+                        'answer TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (name, rdtype))')
+        self.db.commit()
+
+    def get(self, name, rdtype):
+        '''
+        Return (status, values) for an unexpired entry, or None when the name has to be queried.
+        '''
+        with self.lock:
+            if (name, rdtype) in self.pending:
+                self.hits += 1
+                status, answer, _ = self.pending[(name, rdtype)]
+                return status, json.loads(answer)
+            row = self.db.execute('SELECT status, answer, expires FROM dns WHERE name = ? AND rdtype = ?',
+                                  (name, rdtype)).fetchone()
+            if row is None or row[2] <= time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0], json.loads(row[1])
+
+    def put(self, name, rdtype, status, values, ttl):
+        expires = time.time() + max(ttl, self.min_ttl)
+        with self.lock:
+            self.pending[(name, rdtype)] = (status, json.dumps(values), expires)
+            if len(self.pending) >= 1000:
+                self.__flush()
+
+    def __flush(self):
+        self.db.executemany('INSERT OR REPLACE INTO dns VALUES (?, ?, ?, ?, ?)',
+                            [key + value for key, value in self.pending.items()])
+        self.db.commit()
+        self.pending = {}
+
+    def flush(self):
+        with self.lock:
+            self.__flush()
+
+    def purge(self):
+        '''
+        Drop expired entries.
+        '''
+        with self.lock:
+            self.__flush()
+            self.db.execute('DELETE FROM dns WHERE expires <= ?', (time.time(),))
+            self.db.commit()
+
+    def close(self):
+        self.purge()
+        self.db.close()
+
+
+WHOIS_CACHE_TTL_DEFAULT = 30
+# an empty WHOIS answer is often a registration the registry has not published yet
+WHOIS_CACHE_EMPTY_TTL = 86400
+
+
+def whois_fingerprint(domain_entries):
+    '''
+    The DNS data a cached WHOIS record is tied to: the nameservers of the entries under a
+    registrable domain, or their addresses if none has NS records.
+    '''
+    for keys in (('dns-ns',), ('dns-a', 'dns-aaaa')):
+        values = sorted({value for domain_entry in domain_entries for key in keys
+                         for value in domain_entry.get(key, []) if value != '!ServFail'})
+        if values:
+            return values
+    return []
+
+
+class WhoisCache():
+    '''
+    On-disk cache of WHOIS results shared between runs, keyed by registrable domain. Entries
+    expire after `ttl` seconds, empty results after a day at most, and an entry is refreshed
+    early when the DNS data it was fetched with (see whois_fingerprint) has changed, since that
+    is when a domain changes hands.
+    '''
+    def __init__(self, path, ttl=WHOIS_CACHE_TTL_DEFAULT * 86400):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS whois ('
+                        'domain TEXT PRIMARY KEY, result TEXT NOT NULL, dns TEXT NOT NULL, expires REAL NOT NULL)')
+        self.db.commit()
+
+    def get(self, domain, fingerprint):
+        '''
+        Return the cached {whois-created, whois-registrar} dict of `domain`, or None when it has to
+        be queried.
+        '''
+        with self.lock:
+            row = self.db.execute('SELECT result, dns, expires FROM whois WHERE domain = ?', (domain,)).fetchone()
+            if row is None or row[2] <= time.time() or json.loads(row[1]) != fingerprint:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, domain, result, fingerprint):
+        ttl = self.ttl if result else min(self.ttl, WHOIS_CACHE_EMPTY_TTL)
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO whois VALUES (?, ?, ?, ?)',
+                            (domain, json.dumps(result), json.dumps(fingerprint), time.time() + ttl))
+
+    def close(self):
+        with self.lock:
+            self.db.execute('DELETE FROM whois WHERE expires <= ?', (time.time(),))
+            self.db.commit()
+            self.db.close()
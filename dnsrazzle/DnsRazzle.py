@@ -7,20 +7,31 @@ __twitter__ = '@securityshrimp'
 __email__ = 'securityshrimp@proton.me'
 
 from .BrowserUtil import screenshot_domain
+from .CacheUtil import whois_fingerprint
+from .IOUtil import DomainEntry
+from .FuzzUtil import decode_entries, expand_domains, list_domains, rank_domain, rank_domain_encoded, registrable_domain
 from .NetUtil import run_portscan, run_recondns, run_whois
+from .ResolverUtil import FairQueue, NameserverPool, ResolverStats, ResolverThread, DNS_CONCURRENCY_DEFAULT
 from .VisionUtil import compare_screenshots
-import queue
+from .WhoisUtil import WhoisScheduler, WHOIS_THROTTLE_ERRORS
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import os
-from dnstwist import DomainThread, UrlParser
-import sys
-import io
+import threading
 from PIL import Image
 
+# guards the captures dict the razzles of a run share
+captures_lock = threading.Lock()
+
+
 class DnsRazzle():
-    def __init__(self, domain, out_dir, tld, dictionary, file, useragent, debug, threads, nmap, recon, driver, nameservers=['1.1.1.1','1.0.0.1']):
+    def __init__(self, domain, out_dir, tld, dictionary, file, useragent, debug, threads, nmap, recon, driver, nameservers=['1.1.1.1','1.0.0.1'], concurrency=DNS_CONCURRENCY_DEFAULT, dns_cache=None, hedge_budget=0.0,
+                 nameserver_pool=None, resolver_stats=None, zone_index=None, bloom_filter=None,
+                 captures=None):
         self.domains = []
+        self.permutations = []
+        self.scores = None
+        self.fuzzed = False
         self.domain = domain
         self.out_dir = out_dir
         self.tld = tld
@@ -28,95 +39,72 @@ class DnsRazzle():
         self.file = file
         self.useragent = useragent
         self.threads = threads
+        self.concurrency = concurrency
+        self.dns_cache = dns_cache
+        self.hedge_budget = hedge_budget
+        self.zone_index = zone_index
+        self.bloom_filter = bloom_filter
         self.workers = []
-        self.jobs = queue.Queue()
         self.jobs_max = 0
         self.debug = debug
         self.nmap = nmap
         self.recon = recon
         self.nameservers = nameservers
-        self.current_nameserver_index = 0
+        self.nameserver_pool = nameserver_pool or NameserverPool(nameservers)
+        self.resolver_stats = resolver_stats or ResolverStats()
         self.model = None
-        self.debug_output = ""
-        self.total_timeout_errors = 0
-        self.last_registered_completed_jobs = 0
+        # domain name -> Future of whether its screenshot was taken, shared by the razzles of a run
+        # so each name is captured once
+        self.captures = captures if captures is not None else {}
 
     def get_next_nameserver(self):
-        nameserver = self.nameservers[self.current_nameserver_index]
-        self.current_nameserver_index = (self.current_nameserver_index + 1) % len(self.nameservers)
-        return nameserver
+        return self.nameserver_pool.best()
 
     def generate_fuzzed_domains(self):
-        from dnstwist import DomainFuzz
-        fuzz = DomainFuzz(self.domain, self.dictionary, self.tld)
-        fuzz.generate()
-        # add additional fuzzing
-        for i in range(97, 123):
-            for j in range(97, 123):
-                new_domain = ".".join(self.domain.split(".")[:-1]) + chr(i) + chr(j) + "." + self.domain.split(".")[-1];
-                fuzz.domains.append({"fuzzer": 'addition', "domain-name": new_domain})
-        if self.tld is not None:
-            for entry in fuzz.domains.copy():
-                for tld in self.tld:
-                    new_domain = ".".join(entry["domain-name"].split(".")[:-1]) + "." + tld;
-                    fuzz.domains.append({"fuzzer": 'tld-swap', "domain-name": new_domain})
-            m = getattr(fuzz, "_DomainFuzz__postprocess")
-            m()
-        # create domains with www. prefix
-        for entry in fuzz.domains.copy():
-            new_domain = "www." + entry["domain-name"];
-            fuzz.domains.append({"fuzzer": 'www prefix', "domain-name": new_domain})
-        self.domains = fuzz.domains
+        self.set_permutations(*rank_domain(self.domain, self.dictionary, self.tld))
+
+    def set_permutations(self, permutations, scores, count):
+        '''
+        Take the ranked permutations, their scores and the number of names they expand to from
+        FuzzUtil.rank_domain().
+        '''
+        self.permutations = permutations
+        self.scores = scores
+        self.fuzzed = True
+        self.jobs_max = count
+
+    def iter_domains(self):
+        '''
+        Yield the permutations with their www. prefixed and tld-swapped variants, one at a time
+        as the resolver asks for them, riskiest first. The permutations were ranked when they were
+        generated, so this only interleaves the TLD tiers. See FuzzUtil.expand_domains.
+        '''
+        return expand_domains(self.permutations, self.tld, variants=self.fuzzed, scores=self.scores)
 
     def whois(self, progress_callback=None):
-        with ThreadPoolExecutor(max_workers=self.threads) as executor:
-            futures = [executor.submit(run_whois, domains=[domain], nameserver=self.get_next_nameserver(), progress_callback=progress_callback) for domain in self.domains]
-            for future in as_completed(futures):
-                future.result()
-
-    def gendom_start(self):
-        url = UrlParser(self.domain)
-
-        for i in range(len(self.domains)):
-            self.jobs.put(self.domains[i])
-        self.jobs_max = len(self.domains)
-
-        self.stderr_capture = io.StringIO()
-        sys.stderr = self.stderr_capture
-
-        for _ in range(self.threads):
-            worker = DomainThread(self.jobs)
-            worker.setDaemon(True)
-            worker.debug = self.debug
-
-            worker.option_extdns = False
-            worker.option_geoip = False
-            worker.option_ssdeep = False
-            worker.option_banners = False
-            worker.option_mxcheck = False
-
-            worker.nameservers = [self.get_next_nameserver()]
-
-            worker.uri_scheme = url.scheme
-            worker.uri_path = url.path
-            worker.uri_query = url.query
-
-            worker.domain_init = url.domain
-            worker.start()
-            self.workers.append(worker)
-
-    def get_timeout_errors(self):
-        self.debug_output = self.stderr_capture.getvalue()
-        # Filter the captured debug output for timeout errors
-        timeout_errors = []
-        for line in self.debug_output.splitlines():
-            if 'expired' in line.lower():
-                timeout_errors.append(line)
-        self.total_timeout_errors += len(timeout_errors)
-        # Clear the contents of the StringIO object
-        self.stderr_capture.truncate(0)
-        self.stderr_capture.seek(0)
-        return timeout_errors
+        whois_domains([self], self.threads, progress_callback)
+
+    def stream_jobs(self, progress=None):
+        '''
+        iter_domains(), correcting jobs_max and the total of `progress` once the stream is exhausted.
+        '''
+        count = 0
+        for entry in self.iter_domains():
+            count += 1
+            yield entry
+        if progress is not None:
+            progress.add(count - self.jobs_max)
+        self.jobs_max = count
+
+    def keep_domain(self, domain_entry, exists):
+        '''
+        Called by the resolver for every finished entry. Only entries that resolved are kept.
+        '''
+        if exists and has_answer(domain_entry):
+            self.domains.append(domain_entry)
+
+    def gendom_start(self, progress=None):
+        return start_resolution([self], progress)
 
     def gendom_stop(self, callback=None):
         for worker in self.workers:
@@ -124,7 +112,15 @@ class DnsRazzle():
                 callback()
             worker.join()
 
-    def check_domains(self, progress_callback=None, browser='chrome'):
+    def resolved_domains(self):
+        return [domain_entry for domain_entry in self.domains
+                if 'dns-a' in domain_entry.keys() and '!ServFail' not in domain_entry['dns-a']]
+
+    def check_domains(self, progress_callback=None, browser='chrome', progress=None, reuse=None):
+        '''
+        Screenshot and compare every resolved domain. `reuse(razzle, domain_entry)` may fill in the
+        results of an earlier run instead and return True, in which case the name is not captured.
+        '''
         success = screenshot_domain(browser, domain=self.domain, out_dir=self.out_dir + '/screenshots/originals/')
         if not success:
             print(f"Failed to capture screenshot for original domain: {self.domain}")
@@ -133,11 +129,22 @@ class DnsRazzle():
             with Image.new('RGB', (1920, 1080), color=(0, 0, 0)) as img:
                 img.save(dummy_image_path)
             print(f"Created dummy image at: {dummy_image_path}")
+        domains = self.resolved_domains()
+        if reuse is not None:
+            remaining = []
+            for domain_entry in domains:
+                if not reuse(self, domain_entry):
+                    remaining.append(domain_entry)
+                    continue
+                if progress_callback:
+                    progress_callback(self, domain_entry)
+                if progress is not None:
+                    progress.advance()
+            domains = remaining
         with ThreadPoolExecutor(max_workers=4) as executor:
             future_to_domain = {
                 executor.submit(self.check_domain, self, domain_entry, progress_callback, browser): domain_entry
-                for domain_entry in self.domains
-                if 'dns-a' in domain_entry.keys() and '!ServFail' not in domain_entry['dns-a']
+                for domain_entry in domains
             }
             for future in as_completed(future_to_domain):
                 domain_entry = future_to_domain[future]
@@ -145,11 +152,25 @@ class DnsRazzle():
                     future.result()
                 except Exception as exc:
                     print(f"Error checking domain {domain_entry['domain-name']}: {exc}")
+                if progress is not None:
+                    progress.advance()
         return True
 
     def check_domain(self, razzle, domain_entry, progress_callback=None, browser='chrome'):
         domain_name = domain_entry['domain-name']  # Capture domain name within this scope
-        success = screenshot_domain(browser, domain=domain_name, out_dir=self.out_dir + '/screenshots/')
+        # the executor threads may meet the same name twice, e.g. a www. variant equal to a permutation
+        with captures_lock:
+            first_check = domain_name not in self.captures
+            if first_check:
+                self.captures[domain_name] = Future()
+            capture = self.captures[domain_name]
+        if first_check:
+            try:
+                capture.set_result(screenshot_domain(browser, domain=domain_name, out_dir=self.out_dir + '/screenshots/'))
+            except Exception as exc:
+                capture.set_exception(exc)
+                raise
+        success = capture.result()
         if success:
             original_png = self.out_dir + '/screenshots/originals/' + self.domain + '.png'
             if Path(original_png).is_file():
@@ -166,9 +187,9 @@ class DnsRazzle():
             if progress_callback:
                 progress_callback(self, domain_entry)
 
-        if self.nmap:
+        if self.nmap and first_check:
             run_portscan(domain_name, self.out_dir)
-        if self.recon:
+        if self.recon and first_check:
             run_recondns(domain_name, self.get_next_nameserver(), self.out_dir, self.threads)
 
 
@@ -196,4 +217,144 @@ class DnsRazzle():
         if len(detections) > 0:
             return "Logo detected."
         else:
-            return "Logo not detected."
\ No newline at end of file
+            return "Logo not detected."
+
+
+def start_resolution(razzles, progress=None, max_permutations=None, time_budget=None):
+    '''
+    Resolve the permutations of all razzles on one shared ResolverThread. Jobs are taken from the
+    razzles' streams in turn, so small targets do not leave the pool idle while large ones finish.
+    A name generated for several razzles is resolved once and its results copied to each. No new
+    lookups are started after `max_permutations` names or `time_budget` seconds.
+    The nameserver pool, stats, cache and concurrency settings of the first razzle are used.
+    '''
+    jobs = FairQueue(progress=progress, limit=max_permutations, time_budget=time_budget)
+    for razzle in razzles:
+        jobs.add(razzle.stream_jobs(progress), razzle.keep_domain, razzle.domain)
+    first = razzles[0]
+    worker = ResolverThread(jobs, first.nameservers, concurrency=first.concurrency, debug=first.debug,
+                            cache=first.dns_cache, pool=first.nameserver_pool, hedge_budget=first.hedge_budget,
+                            stats=first.resolver_stats, progress=progress, zone_index=first.zone_index,
+                            bloom_filter=first.bloom_filter)
+    for razzle in razzles:
+        razzle.workers.append(worker)
+    worker.start()
+    return worker
+
+
+def generate_permutations(razzles, processes=None, progress_callback=None):
+    '''
+    Generate the permutations of every razzle, one brand per task on a pool of `processes`
+    worker processes, so large brand lists use every core. Permutations are ranked in the
+    workers too (FuzzUtil.rank_domain) and come back compactly encoded (FuzzUtil.encode_entries)
+    as each brand finishes. `progress_callback(razzle)` is called for each.
+    '''
+    if len(razzles) < 2 or processes == 1:
+        for razzle in razzles:
+            razzle.generate_fuzzed_domains()
+            if progress_callback is not None:
+                progress_callback(razzle)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(rank_domain_encoded, razzle.domain, razzle.dictionary, razzle.tld): razzle
+                   for razzle in razzles}
+        for future in as_completed(futures):
+            razzle = futures[future]
+            encoded, scores, count = future.result()
+            razzle.set_permutations(decode_entries(encoded), scores, count)
+            if progress_callback is not None:
+                progress_callback(razzle)
+
+
+def list_permutations(razzles, processes=None):
+    '''
+    Yield, per razzle and in order, chunks of the newline-separated names -g prints. The
+    permutations are generated and ranked on a pool of `processes` worker processes like
+    generate_permutations() does; their www. and tld-swap variants are expanded here as they are
+    printed, so no brand's whole list is held in memory (see FuzzUtil.list_domains).
+    '''
+    if len(razzles) < 2 or processes == 1:
+        for razzle in razzles:
+            entries, scores, _ = rank_domain(razzle.domain, razzle.dictionary, razzle.tld)
+            yield from list_domains(razzle.domain, entries, razzle.tld, scores)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        ranked = executor.map(rank_domain_encoded, [razzle.domain for razzle in razzles],
+                              [razzle.dictionary for razzle in razzles], [razzle.tld for razzle in razzles])
+        for razzle, (encoded, scores, _) in zip(razzles, ranked):
+            yield from list_domains(razzle.domain, decode_entries(encoded), razzle.tld, scores)
+
+
+def has_answer(domain_entry):
+    '''
+    Whether any of the DNS lookups of the entry got an answer other than SERVFAIL.
+    '''
+    return any(domain_entry.get(key) and domain_entry[key] != ['!ServFail']
+               for key in ('dns-ns', 'dns-a', 'dns-aaaa', 'dns-mx'))
+
+
+def whois_targets(razzles, skip=()):
+    '''
+    Map the registrable domain of every name any of the razzles resolved to the entries under
+    it, so x.com and www.x.com, and names shared by several razzles, share one query. Names in
+    `skip` are left out.
+    '''
+    targets = {}
+    for razzle in razzles:
+        for domain_entry in razzle.domains:
+            if domain_entry['domain-name'] in skip or not has_answer(domain_entry):
+                continue
+            registrable = registrable_domain(domain_entry['domain-name'])
+            if registrable is not None:
+                targets.setdefault(registrable, []).append(domain_entry)
+    return targets
+
+
+def whois_domains(razzles, threads, progress_callback=None, skip=(), cache=None, scheduler=None):
+    '''
+    Run WHOIS once for every registrable domain in whois_targets() and copy the result to all
+    of its entries. Domains with an unexpired record in the WhoisCache `cache`, fetched with the
+    same DNS data, are not queried. The queries of all razzles run on one WhoisScheduler with
+    `threads` workers, paced per registry, which retries those the registry throttled.
+    `progress_callback` is called once per registrable domain.
+    '''
+    targets = whois_targets(razzles, skip)
+    queries = {registrable: DomainEntry(None, registrable) for registrable in targets}
+    pending = []
+    for registrable, query in queries.items():
+        cached = cache.get(registrable, whois_fingerprint(targets[registrable])) if cache is not None else None
+        if cached is None:
+            pending.append(query)
+            continue
+        for key, value in cached.items():
+            query[key] = value
+        if progress_callback is not None:
+            progress_callback()
+    nameserver_pool = razzles[0].nameserver_pool
+    debug = razzles[0].debug
+    if scheduler is None:
+        scheduler = WhoisScheduler()
+
+    def query_whois(query):
+        if 'whois-error' in query:
+            del query['whois-error']
+        run_whois(domains=[query], nameserver=nameserver_pool.best(), slow_down=0, debug=debug)
+        return query.get('whois-error') in WHOIS_THROTTLE_ERRORS
+
+    def finished(query):
+        if progress_callback is not None:
+            progress_callback()
+
+    for query in pending:
+        scheduler.add(query)
+    scheduler.run(query_whois, threads, finished)
+    if cache is not None:
+        for query in pending:
+            if 'whois-error' not in query:
+                cache.put(query['domain-name'], {key: query[key] for key in ('whois-created', 'whois-registrar') if key in query},
+                          whois_fingerprint(targets[query['domain-name']]))
+    for registrable, entries in targets.items():
+        for key in ('whois-created', 'whois-registrar'):
+            if key in queries[registrable]:
+                for domain_entry in entries:
+                    domain_entry[key] = queries[registrable][key]
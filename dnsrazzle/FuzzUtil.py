@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import array
+import heapq
+import os
+import re
+import dnstwist
+from .IOUtil import DomainEntry
+from .SuffixUtil import SuffixIndex, psl_path
+
+
+# the last label as dnstwist.VALID_FQDN_REGEX accepts it
+VALID_TLD_REGEX = re.compile(r'[a-zA-Z]{2,63}$')
+
+
+# the table of dnstwist 20201228's DomainFuzz.__homoglyph, which keeps it local to the method
+glyphs = {
+    'a': ['à', 'á', 'â', 'ã', 'ä', 'å', 'ɑ', 'ạ', 'ǎ', 'ă', 'ȧ', 'ą'],
+    'b': ['d', 'lb', 'ʙ', 'ɓ', 'ḃ', 'ḅ', 'ḇ', 'ƅ'],
+    'c': ['e', 'ƈ', 'ċ', 'ć', 'ç', 'č', 'ĉ'],
+    'd': ['b', 'cl', 'dl', 'ɗ', 'đ', 'ď', 'ɖ', 'ḑ', 'ḋ', 'ḍ', 'ḏ', 'ḓ'],
+    'e': ['c', 'é', 'è', 'ê', 'ë', 'ē', 'ĕ', 'ě', 'ė', 'ẹ', 'ę', 'ȩ', 'ɇ', 'ḛ'],
+    'f': ['ƒ', 'ḟ'],
+    'g': ['q', 'ɢ', 'ɡ', 'ġ', 'ğ', 'ǵ', 'ģ', 'ĝ', 'ǧ', 'ǥ'],
+    'h': ['lh', 'ĥ', 'ȟ', 'ħ', 'ɦ', 'ḧ', 'ḩ', 'ⱨ', 'ḣ', 'ḥ', 'ḫ', 'ẖ'],
+    'i': ['1', 'l', 'í', 'ì', 'ï', 'ı', 'ɩ', 'ǐ', 'ĭ', 'ỉ', 'ị', 'ɨ', 'ȋ', 'ī'],
+    'j': ['ʝ', 'ɉ'],
+    'k': ['lk', 'ik', 'lc', 'ḳ', 'ḵ', 'ⱪ', 'ķ'],
+    'l': ['1', 'i', 'ɫ', 'ł'],
+    'm': ['n', 'nn', 'rn', 'rr', 'ṁ', 'ṃ', 'ᴍ', 'ɱ', 'ḿ'],
+    'n': ['m', 'r', 'ń', 'ṅ', 'ṇ', 'ṉ', 'ñ', 'ņ', 'ǹ', 'ň', 'ꞑ'],
+    'o': ['0', 'ȯ', 'ọ', 'ỏ', 'ơ', 'ó', 'ö'],
+    'p': ['ƿ', 'ƥ', 'ṕ', 'ṗ'],
+    'q': ['g', 'ʠ'],
+    'r': ['ʀ', 'ɼ', 'ɽ', 'ŕ', 'ŗ', 'ř', 'ɍ', 'ɾ', 'ȓ', 'ȑ', 'ṙ', 'ṛ', 'ṟ'],
+    's': ['ʂ', 'ś', 'ṣ', 'ṡ', 'ș', 'ŝ', 'š'],
+    't': ['ţ', 'ŧ', 'ṫ', 'ṭ', 'ț', 'ƫ'],
+    'u': ['ᴜ', 'ǔ', 'ŭ', 'ü', 'ʉ', 'ù', 'ú', 'û', 'ũ', 'ū', 'ų', 'ư', 'ů', 'ű', 'ȕ', 'ȗ', 'ụ'],
+    'v': ['ṿ', 'ⱱ', 'ᶌ', 'ṽ', 'ⱴ'],
+    'w': ['vv', 'ŵ', 'ẁ', 'ẃ', 'ẅ', 'ⱳ', 'ẇ', 'ẉ', 'ẘ'],
+    'y': ['ʏ', 'ý', 'ÿ', 'ŷ', 'ƴ', 'ȳ', 'ɏ', 'ỿ', 'ẏ', 'ỵ'],
+    'z': ['ʐ', 'ż', 'ź', 'ᴢ', 'ƶ', 'ẓ', 'ẕ', 'ⱬ']
+}
+
+
+def homoglyph_pass(domain, result):
+    '''
+    Add to `result` every name that one window of dnstwist's homoglyph pass produces from
+    `domain`. A window replaces all occurrences of one character inside it with one glyph, and
+    windows are any proper substring, so the outputs are exactly: for each character, each run
+    of consecutive occurrences of it, and each of its glyphs, those occurrences replaced by the
+    glyph. Only a run covering the whole name (first to last character) is out of reach.
+    '''
+    last = len(domain) - 1
+    positions = {}
+    for i, c in enumerate(domain):
+        if c in glyphs:
+            positions.setdefault(c, []).append(i)
+    for c, occurrences in positions.items():
+        for a, start in enumerate(occurrences):
+            for b in range(a, len(occurrences)):
+                end = occurrences[b]
+                if start == 0 and end == last:
+                    continue
+                if a == b:
+                    head, tail = domain[:start], domain[start + 1:]
+                    for g in glyphs[c]:
+                        result.add(head + g + tail)
+                else:
+                    head, middle, tail = domain[:start], domain[start:end + 1], domain[end + 1:]
+                    for g in glyphs[c]:
+                        result.add(head + middle.replace(c, g) + tail)
+
+
+def homoglyphs(domain):
+    '''
+    The names DomainFuzz.__homoglyph returns for `domain`: one homoglyph pass over it, and a
+    second pass over each of those.
+    '''
+    result_1pass = set()
+    homoglyph_pass(domain, result_1pass)
+    result = set(result_1pass)
+    for name in result_1pass:
+        homoglyph_pass(name, result)
+    return list(result)
+
+
+class DomainFuzz(dnstwist.DomainFuzz):
+    '''
+    dnstwist's DomainFuzz with the homoglyph fuzzer replaced by homoglyphs(). The original walks
+    every window of every candidate and calls str.replace per glyph, revisiting the same names
+    many times over, which dominates generation for long brand names.
+    '''
+    def _DomainFuzz__homoglyph(self):
+        return homoglyphs(self.domain)
+
+
+def fuzz_domain(domain, dictionary, tld):
+    '''
+    DomainFuzz's permutations of `domain` plus DNSRazzle's two-letter additions, as dicts.
+    '''
+    fuzz = DomainFuzz(domain, dictionary, tld)
+    fuzz.generate()
+    prefix, public_suffix = split_suffix(domain)
+    # add additional fuzzing
+    for i in range(97, 123):
+        for j in range(97, 123):
+            new_domain = prefix + chr(i) + chr(j) + "." + public_suffix
+            fuzz.domains.append({"fuzzer": 'addition', "domain-name": new_domain})
+    return fuzz.domains
+
+
+def find_dictionary(name):
+    '''
+    Path of one of DNSRazzle's bundled dictionaries, from the source tree or where setup.py
+    installs them, or None.
+    '''
+    for folder in (os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dictionaries'),
+                   '/etc/DNSrazzle'):
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+_suffix_index = None
+
+
+def suffix_index():
+    '''
+    The SuffixIndex of dictionaries/tlds-alpha-by-domain.txt and the tld package's public suffix
+    list, loaded once per process, or None if neither is available.
+    '''
+    global _suffix_index
+    if _suffix_index is None:
+        tld_file, psl_file = find_dictionary('tlds-alpha-by-domain.txt'), psl_path()
+        _suffix_index = SuffixIndex.load(tld_file, psl_file) if tld_file or psl_file else False
+    return _suffix_index or None
+
+
+def registrable_domain(name):
+    '''
+    The registrable domain of `name` (see SuffixIndex.registrable_domain), or its last two
+    labels if there is no suffix index.
+    '''
+    index = suffix_index()
+    if index is not None:
+        return index.registrable_domain(name.lower())
+    return '.'.join(name.lower().split('.')[-2:])
+
+
+def read_tlds(name):
+    path = find_dictionary(name)
+    if path is None:
+        return []
+    with open(path) as f:
+        return [line.strip().lower() for line in f if line.strip()]
+
+
+# names per chunk that list_domains() joins for -g to print
+LIST_CHUNK_SIZE = 4096
+
+# how likely a permutation from each fuzzer is to be registered by an attacker
+fuzzer_weights = {
+    'original*': 100,
+    'replacement': 8, 'transposition': 8, 'omission': 8,
+    'homoglyph': 7, 'repetition': 7, 'insertion': 7,
+    'hyphenation': 6, 'vowel-swap': 6, 'dictionary': 6, 'tld-swap': 6,
+    'bitsquatting': 5, 'addition': 5,
+    'subdomain': 4, 'various': 4,
+}
+FUZZER_WEIGHT_DEFAULT = 4
+# a tld-swap ranks this much below the permutation it swaps, plus the TLD's tier bonus below
+TLD_SWAP_PENALTY = 3
+TLD_BONUS_ABUSED = 2
+TLD_BONUS_COMMON = 1
+
+
+def edit_distance(a, b):
+    '''
+    Optimal string alignment distance: insertions, deletions, substitutions and swaps of two
+    adjacent characters each cost 1.
+    '''
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def permutation_score(brand, name, fuzzer, keyboards):
+    '''
+    Risk score of permutation `name` of `brand` (both without TLD, decoded): the fuzzer's
+    weight, less 2 for every edit beyond the first, plus 1 for a single substitution of a
+    neighbouring key and 1 for an ASCII name.
+    '''
+    score = fuzzer_weights.get(fuzzer, FUZZER_WEIGHT_DEFAULT)
+    if fuzzer == 'original*':
+        return score
+    distance = edit_distance(brand, name)
+    score -= 2 * max(distance - 1, 0)
+    if distance == 1 and len(brand) == len(name):
+        for a, b in zip(brand, name):
+            if a != b:
+                if any(b in keys.get(a, '') for keys in keyboards):
+                    score += 1
+                break
+    if name.isascii():
+        score += 1
+    return score
+
+
+def rank_permutations(domain, permutations):
+    '''
+    `permutations` of `domain` as (score, entry) pairs, riskiest first.
+    '''
+    keyboards = DomainFuzz(domain).keyboards
+    brand = domain.rsplit('.', 1)[0]
+    ranked = []
+    for entry in permutations:
+        try:
+            name = dnstwist.idna.decode(entry["domain-name"])
+        except Exception:
+            name = entry["domain-name"]
+        score = permutation_score(brand, name.rsplit('.', 1)[0], entry.get("fuzzer"), keyboards)
+        ranked.append((score, entry))
+    ranked.sort(key=lambda pair: -pair[0])
+    return ranked
+
+
+def tld_tiers(tld):
+    '''
+    Split `tld` into (bonus, tlds) tiers: TLDs in dictionaries/abused_tlds.dict first, in that
+    file's order, then those in common_tlds.dict, then the rest.
+    '''
+    lowered = {x.lower(): x for x in tld}
+    abused = [lowered[x] for x in read_tlds('abused_tlds.dict') if x in lowered]
+    common = {lowered[x] for x in read_tlds('common_tlds.dict') if x in lowered} - set(abused)
+    return [(TLD_BONUS_ABUSED, abused),
+            (TLD_BONUS_COMMON, [x for x in tld if x in common]),
+            (0, [x for x in tld if x not in common and x not in abused])]
+
+
+def valid_entries(permutations, seen):
+    '''
+    Yield `permutations` as DomainEntry records with punycoded, lowercased names, like DomainFuzz
+    validates its own list: names that are not valid, were already in `seen` or cannot be registered,
+    because their TLD is not delegated or they are a public suffix themselves, are dropped.
+    '''
+    index = suffix_index()
+    for entry in permutations:
+        try:
+            name = dnstwist.idna.encode(entry["domain-name"]).decode().lower()
+        except Exception:
+            continue
+        if dnstwist.VALID_FQDN_REGEX.match(name) and name not in seen and (index is None or index.is_registrable(name)):
+            seen.add(name)
+            entry = entry if isinstance(entry, DomainEntry) else DomainEntry.from_dict(entry)
+            entry["domain-name"] = name
+            yield entry
+
+
+def tld_suffixes(tld):
+    '''
+    Map each TLD of `tld` to the IDNA encoded, lowercased public suffix a tld-swap puts in its
+    place, or to None if names cannot be registered under it. IANA's list is uppercase, and an
+    uppercase swap would otherwise be resolved again next to its lowercase twin.
+    '''
+    index = suffix_index()
+    suffixes = {}
+    for swap in tld or []:
+        try:
+            encoded = dnstwist.idna.encode(swap).decode().lower()
+        except Exception:
+            encoded = None
+        if encoded is None or not VALID_TLD_REGEX.match(encoded.rsplit(".", 1)[-1]):
+            encoded = None
+        elif index is None:
+            encoded = encoded if "." not in encoded else None
+        elif not index.is_suffix(encoded):
+            encoded = None
+        suffixes[swap] = encoded
+    return suffixes
+
+
+def split_suffix(name):
+    '''
+    `name` split into the labels a tld-swap keeps and its public suffix.
+    '''
+    index = suffix_index()
+    if index is not None:
+        return index.split(name.lower())
+    return ".".join(name.split(".")[:-1]), name.split(".")[-1]
+
+
+def count_domains(entries, tld):
+    '''
+    How many names expand_domains() yields for validated `entries` and `tld`: each entry and
+    every distinct tld-swap of them, each with its www. variant. Swaps longer than a name may be
+    are counted too, so this is exact for all but pathological names.
+    '''
+    usable = {encoded for encoded in tld_suffixes(tld).values() if encoded is not None}
+    prefixes = set()
+    covered = 0
+    for entry in entries:
+        prefix, public_suffix = split_suffix(entry["domain-name"])
+        prefixes.add(prefix)
+        if public_suffix in usable:
+            covered += 1
+    return 2 * len(entries) + 2 * (len(prefixes) * len(usable) - covered)
+
+
+def rank_domain(domain, dictionary, tld):
+    '''
+    The permutations of `domain`, validated (see valid_entries) and ranked riskiest first, as
+    (entries, scores, count) with the score of each entry and the number of names
+    expand_domains() makes of them. This is the CPU heavy part of preparing a target, so it
+    runs before resolution starts, in a worker process for brand lists.
+    '''
+    entries = list(valid_entries(fuzz_domain(domain, dictionary, tld), set()))
+    ranked = rank_permutations(domain, entries)
+    entries = [entry for _, entry in ranked]
+    return entries, array.array('h', (score for score, _ in ranked)), count_domains(entries, tld)
+
+
+def expand_domains(permutations, tld, variants=True, scores=None):
+    '''
+    Yield `permutations` as DomainEntry records, and if `variants` their www. prefixed and
+    tld-swapped variants, one at a time, so only the names seen so far are kept in memory
+    instead of an entry for every permutation times every TLD. TLDs swap the whole public
+    suffix (see SuffixUtil.SuffixIndex).
+
+    With the `scores` of rank_domain(), `permutations` are taken as already validated and
+    ranked, and only the TLD tiers (see tld_tiers) are interleaved with them, so everything
+    comes out riskiest first and a run cut short by a budget has covered the likeliest
+    typosquats. Otherwise the permutations are validated on the way (see valid_entries) and come
+    first in the given order, then their variants. A www. variant always follows its
+    permutation.
+
+    A tld-swap keeps the labels of a permutation that has already been encoded and validated,
+    so only its TLD is IDNA encoded, once per TLD, and only the length check is left to do.
+    '''
+    seen = set()
+    suffixes = tld_suffixes(tld)
+
+    def swaps(entry, tlds):
+        prefix = split_suffix(entry["domain-name"])[0]
+        for swap in tlds:
+            encoded = suffixes[swap]
+            if encoded is None:
+                continue
+            new_domain = prefix + "." + encoded
+            if len(new_domain) <= 253 and new_domain not in seen:
+                seen.add(new_domain)
+                yield DomainEntry('tld-swap', new_domain)
+                yield DomainEntry('www prefix', "www." + new_domain)
+
+    if scores is None:
+        valid = []
+        for entry in valid_entries(permutations, seen):
+            valid.append(entry)
+            yield entry
+        if variants:
+            for entry in valid:
+                yield DomainEntry('www prefix', "www." + entry["domain-name"])
+                yield from swaps(entry, tld or [])
+        return
+
+    def tier(offset, tlds):
+        for score, entry in zip(scores, permutations):
+            yield score + offset, entry, tlds
+
+    seen.update(entry["domain-name"] for entry in permutations)
+    streams = [tier(0, None)]
+    if variants and tld:
+        for bonus, tlds in tld_tiers(tld):
+            if tlds:
+                streams.append(tier(bonus - TLD_SWAP_PENALTY, tlds))
+    for score, entry, tlds in heapq.merge(*streams, key=lambda item: -item[0]):
+        if tlds is None:
+            yield entry
+            if variants:
+                yield DomainEntry('www prefix', "www." + entry["domain-name"])
+        else:
+            yield from swaps(entry, tlds)
+
+
+def encode_entries(entries):
+    '''
+    Pack (fuzzer, name) entries for the trip back from a worker process: the distinct fuzzer
+    labels, one byte per entry indexing them, and the names joined by newlines. That pickles to
+    a few bytes per entry instead of a dict each.
+    '''
+    labels = {}
+    indexes = bytearray()
+    names = []
+    for entry in entries:
+        indexes.append(labels.setdefault(entry["fuzzer"], len(labels)))
+        names.append(entry["domain-name"])
+    return tuple(labels), bytes(indexes), "\n".join(names)
+
+
+def decode_entries(encoded):
+    labels, indexes, names = encoded
+    if not indexes:
+        return []
+    return [DomainEntry(labels[index], name) for index, name in zip(indexes, names.split("\n"))]
+
+
+def rank_domain_encoded(domain, dictionary, tld):
+    entries, scores, count = rank_domain(domain, dictionary, tld)
+    return encode_entries(entries), scores, count
+
+
+def list_domains(domain, permutations, tld, scores, chunk_size=LIST_CHUNK_SIZE):
+    '''
+    Yield every name a run would look up for `domain` except the domain itself, as -g prints
+    them: expanded from the ranked `permutations` and `scores` of rank_domain() as the stream
+    goes, `chunk_size` names at a time joined by newlines.
+    '''
+    names = []
+    for entry in expand_domains(permutations, tld, scores=scores):
+        if entry["domain-name"] != domain:
+            names.append(entry["domain-name"])
+            if len(names) >= chunk_size:
+                yield "\n".join(names)
+                names = []
+    if names:
+        yield "\n".join(names)
@@ -37,7 +37,9 @@ __email__ = 'securityshrimp@proton.me'
 
 import os
 import sys
+import threading
 import time
+from progress.bar import Bar
 
 
 '''Global Variables'''
@@ -109,6 +111,75 @@ def print_debug(message=""):
 def print_line(message=""):
     print(f"{message}", flush=True)
 
+class ProgressSink():
+    '''
+    Receives completion events from the workers of a stage and drives either a progress Bar or,
+    non-interactively, a status line starting with `label` every `interval` seconds. `detail` may
+    return extra text for the status line. The stage owner calls finish() once its workers are done, and wait() returns
+    only then.
+    '''
+    def __init__(self, title, total, interactive=True, interval=60, detail=None, label=None):
+        self.title = title
+        self.label = label or title
+        self.total = total
+        self.interactive = interactive
+        self.interval = interval
+        self.detail = detail
+        self.completed = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.last_draw = time.monotonic()
+        if interactive:
+            self.bar = Bar(title, max=max(total, 1))
+        else:
+            self.bar = None
+            print_status(title)
+
+    def advance(self, count=1):
+        with self.lock:
+            self.completed += count
+            now = time.monotonic()
+            if self.interactive:
+                if now - self.last_draw >= 0.1 or self.completed >= self.total:
+                    self.last_draw = now
+                    self.bar.goto(min(self.completed, self.bar.max))
+            elif now - self.last_draw >= self.interval:
+                self.last_draw = now
+                self.print_progress()
+
+    def add(self, count=1):
+        with self.lock:
+            self.total += count
+            if self.interactive:
+                self.bar.max = max(self.total, 1)
+
+    def print_progress(self):
+        percentage = (self.completed / self.total) * 100 if self.total else 100
+        detail = f". {self.detail(self.completed)}" if self.detail is not None else ""
+        print_status(f"{self.label} {self.completed}/{self.total} ({percentage:.1f}%){detail}")
+
+    def stop(self):
+        '''
+        The stage was cut short, so the rest of the total will never complete: shrink it to what has.
+        '''
+        with self.lock:
+            self.total = self.completed
+            if self.interactive:
+                self.bar.max = max(self.total, 1)
+
+    def finish(self):
+        self.done.set()
+
+    def wait(self):
+        self.done.wait()
+        with self.lock:
+            if self.interactive:
+                self.bar.goto(self.bar.max)
+                self.bar.finish()
+            else:
+                self.print_progress()
+
+
 domain_entry_keys = [
     'domain-name',
     # 'ssdeep-score', 'ssim-score',
@@ -119,6 +190,93 @@ domain_entry_keys = [
     'fuzzer',
 ]
 
+
+class DomainEntry():
+    '''
+    Compact stand-in for the dicts dnstwist uses as domain entries. The name and the interned
+    fuzzer label are slots, and anything the later stages add (dns-a, whois-created,
+    ssim-score, ...) goes into a dict that only exists once something is set. Most permutations
+    never resolve, so they cost a small fraction of a dict. Supports the part of the dict
+    interface used by DNSRazzle, csv.DictWriter and format_domains.
+
+    `sources` lists the (brand, fuzzer) pairs that generated the name when several targets are
+    resolved together. It is not one of the keys, so the CSV is unaffected.
+    '''
+    __slots__ = ('name', 'fuzzer', 'data', 'sources')
+
+    def __init__(self, fuzzer, name):
+        self.name = name
+        self.fuzzer = sys.intern(fuzzer) if fuzzer is not None else None
+        self.data = None
+        self.sources = None
+
+    @classmethod
+    def from_dict(cls, entry):
+        domain_entry = cls(entry.get('fuzzer'), entry['domain-name'])
+        for key, value in entry.items():
+            if key not in ('fuzzer', 'domain-name'):
+                domain_entry[key] = value
+        return domain_entry
+
+    def __getitem__(self, key):
+        if key == 'domain-name':
+            return self.name
+        if key == 'fuzzer' and self.fuzzer is not None:
+            return self.fuzzer
+        if self.data is not None and key in self.data:
+            return self.data[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'domain-name':
+            self.name = value
+        elif key == 'fuzzer':
+            self.fuzzer = sys.intern(value)
+        else:
+            if self.data is None:
+                self.data = {}
+            self.data[key] = value
+
+    def __delitem__(self, key):
+        if self.data is None or key not in self.data:
+            raise KeyError(key)
+        del self.data[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        entry = {'fuzzer': self.fuzzer} if self.fuzzer is not None else {}
+        entry['domain-name'] = self.name
+        if self.data is not None:
+            entry.update(self.data)
+        return entry
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return (self.fuzzer is not None) + 1 + (len(self.data) if self.data is not None else 0)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
 def format_domains(domains=[]):
 # method for formatting domain output
     cli = []
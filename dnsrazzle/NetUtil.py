@@ -37,24 +37,26 @@ __email__ = 'securityshrimp@proton.me'
 
 from whoisdomain import query
 from .IOUtil import print_error, reset_tty, print_status, write_to_file
+from .WhoisUtil import WHOIS_THROTTLE_ERRORS
 from recondns import general_enum, DnsHelper, make_csv
 import nmap
 
-def run_whois(domains, nameserver, progress_callback=None):
+def run_whois(domains, nameserver, progress_callback=None, slow_down=2, debug=False):
     for domain in domains:
-        if len(domain) > 2:
-            try:
-                whoisq = query(domain=domain['domain-name'].encode('idna').decode(),timeout=10,simplistic=True,slow_down=2)
-            except Exception as e:
-                print_error(f"Failed to run WHOIS query for {domain['domain-name']}")
-                print_error(e)
+        try:
+            whoisq = query(domain=domain['domain-name'].encode('idna').decode(),timeout=10,slow_down=slow_down)
+        except Exception as e:
+            # failures are common for swapped TLDs, and throttling is reported per registry
+            domain['whois-error'] = type(e).__name__
+            if debug and domain['whois-error'] not in WHOIS_THROTTLE_ERRORS:
+                print_error(f"Failed to run WHOIS query for {domain['domain-name']}: {e}")
                 reset_tty()
-            else:
-                if whoisq is not None:
-                    if whoisq.creation_date:
-                        domain['whois-created'] = str(whoisq.creation_date).split(' ')[0]
-                    if whoisq.registrar:
-                        domain['whois-registrar'] = str(whoisq.registrar)
+        else:
+            if whoisq is not None:
+                if whoisq.creation_date:
+                    domain['whois-created'] = str(whoisq.creation_date).split(' ')[0]
+                if whoisq.registrar:
+                    domain['whois-registrar'] = str(whoisq.registrar)
         if progress_callback is not None:
             progress_callback()
 
@@ -0,0 +1,826 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import asyncio
+import queue
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from . import WireUtil
+from .CacheUtil import STATUS_ANSWER, STATUS_NOANSWER, STATUS_NXDOMAIN
+from .WireUtil import WireError
+
+
+DNS_CONCURRENCY_DEFAULT = 1000
+REQUEST_TIMEOUT_DNS = 5
+REQUEST_RETRIES_DNS = 2
+SOCKET_RCVBUF = 1 << 20
+
+LATENCY_SAMPLES = 512
+WINDOW_INITIAL = 64
+WINDOW_MIN = 4
+WINDOW_MAX = 4096
+EJECT_AFTER_TIMEOUTS = 8
+EJECT_BACKOFF_MIN = 5
+EJECT_BACKOFF_MAX = 120
+HEDGE_MIN_SAMPLES = 50
+HEDGE_BURST = 20
+
+
+class ResolverError(Exception):
+    pass
+
+
+class NXDomainError(ResolverError):
+    pass
+
+
+class NoAnswerError(ResolverError):
+    pass
+
+
+class ServFailError(ResolverError):
+    pass
+
+
+class ResolverTimeout(ResolverError):
+    pass
+
+
+def answer_to_list(answers):
+    return sorted([str(x).split(' ')[-1].rstrip('.') for x in answers])
+
+
+class NameserverProtocol(asyncio.DatagramProtocol):
+    '''
+    Datagram endpoint for a single nameserver. Outstanding queries are kept by message ID so
+    that any number of them can share the one socket, and replies are matched as they arrive.
+    '''
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
+            except OSError:
+                pass
+
+    def datagram_received(self, data, addr):
+        try:
+            response = WireUtil.parse_response(data)
+        except (WireError, struct.error):
+            return
+        pending = self.pending.get(response.id)
+        if pending is None:
+            return
+        question, future = pending
+        if not future.done() and (response.qname, response.qtype) == question:
+            future.set_result(response)
+
+    def error_received(self, exc):
+        for question, future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    def connection_lost(self, exc):
+        self.error_received(exc or ConnectionError('nameserver socket closed'))
+
+
+class NameserverClient():
+    '''
+    Sends queries to one nameserver over a single, reused UDP socket, and repeats a query
+    over TCP when the UDP answer comes back truncated.
+    '''
+    def __init__(self, address, port=53):
+        self.address = address
+        self.port = port
+        self.protocol = None
+        self.lock = asyncio.Lock()
+
+    async def connect(self):
+        async with self.lock:
+            if self.protocol is None or self.protocol.transport.is_closing():
+                loop = asyncio.get_running_loop()
+                _, self.protocol = await loop.create_datagram_endpoint(NameserverProtocol, remote_addr=(self.address, self.port))
+        return self.protocol
+
+    def next_id(self, protocol):
+        while True:
+            qid = random.randint(0, 0xffff)
+            if qid not in protocol.pending:
+                return qid
+
+    async def query(self, name, rdtype, timeout):
+        protocol = await self.connect()
+        qid = self.next_id(protocol)
+        future = asyncio.get_running_loop().create_future()
+        protocol.pending[qid] = ((name, rdtype), future)
+        try:
+            protocol.transport.sendto(WireUtil.build_query(qid, name, rdtype))
+            response = await asyncio.wait_for(future, timeout)
+        finally:
+            protocol.pending.pop(qid, None)
+        if response.truncated:
+            response = await asyncio.wait_for(self.query_tcp(name, rdtype), timeout)
+        return response
+
+    async def query_tcp(self, name, rdtype):
+        qid = random.randint(0, 0xffff)
+        request = WireUtil.build_query(qid, name, rdtype, payload=0)
+        reader, writer = await asyncio.open_connection(self.address, self.port)
+        try:
+            writer.write(struct.pack('!H', len(request)) + request)
+            await writer.drain()
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+            response = WireUtil.parse_response(await reader.readexactly(length))
+        finally:
+            writer.close()
+        if response.id != qid or (response.qname, response.qtype) != (name, rdtype):
+            raise WireError(f'mismatched TCP response from {self.address}')
+        return response
+
+    def close(self):
+        if self.protocol is not None:
+            self.protocol.transport.close()
+
+
+class NameserverStats():
+    '''
+    Health of a single nameserver: recent latencies, timeout rate, the AIMD window capping how
+    many of our queries it may have in flight, and whether it is currently ejected.
+    '''
+    def __init__(self, address):
+        self.address = address
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.ordered = []
+        self.answers = 0
+        self.queries = 0
+        self.timeout_rate = 0.0
+        self.consecutive_timeouts = 0
+        self.window = WINDOW_INITIAL
+        self.last_decrease = 0.0
+        self.inflight = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def add_latency(self, latency):
+        self.latencies.append(latency)
+        self.answers += 1
+        if self.answers < 32 or self.answers % 32 == 0:
+            self.ordered = sorted(self.latencies)
+
+    def percentile(self, pct):
+        if not self.ordered:
+            return None
+        return self.ordered[min(len(self.ordered) - 1, int(len(self.ordered) * pct / 100))]
+
+    def is_ejected(self, now):
+        return self.ejected_until > now
+
+    def hedge_delay(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return self.percentile(95)
+
+    def score(self):
+        latency = self.percentile(50) or 0.05
+        return latency * (1 + 10 * self.timeout_rate) * (1 + self.inflight / self.window)
+
+
+class NameserverPool():
+    '''
+    Steers queries between nameservers by observed health. Each query goes to the server with the
+    best latency and timeout record that still has room in its window. Windows grow additively
+    with every answer and are halved (at most once a second) when a server times out or refuses
+    us, and a server that keeps timing out is ejected for an exponentially growing period.
+    All methods are thread-safe.
+    '''
+    def __init__(self, nameservers):
+        self.lock = threading.Lock()
+        self.servers = {ns: NameserverStats(ns) for ns in nameservers}
+
+    def select(self, exclude=()):
+        '''
+        Reserve a slot on the best available server and return its address, or None when every
+        candidate is at its window and the caller has to wait for a release.
+        '''
+        now = time.monotonic()
+        with self.lock:
+            candidates = [s for s in self.servers.values() if s.address not in exclude] or list(self.servers.values())
+            healthy = [s for s in candidates if not s.is_ejected(now)]
+            if not healthy:
+                healthy = [min(candidates, key=lambda s: s.ejected_until)]
+            open_servers = [s for s in healthy if s.inflight < s.window]
+            if not open_servers:
+                return None
+            server = min(open_servers, key=NameserverStats.score)
+            server.inflight += 1
+            server.queries += 1
+            return server.address
+
+    def release(self, address):
+        with self.lock:
+            self.servers[address].inflight -= 1
+
+    def record_answer(self, address, latency):
+        with self.lock:
+            server = self.servers[address]
+            server.add_latency(latency)
+            server.timeout_rate *= 0.99
+            server.consecutive_timeouts = 0
+            server.ejections = 0
+            server.window = min(WINDOW_MAX, server.window + 1)
+
+    def record_timeout(self, address):
+        with self.lock:
+            server = self.servers[address]
+            server.timeout_rate = server.timeout_rate * 0.99 + 0.01
+            server.consecutive_timeouts += 1
+            self.__decrease(server)
+            now = time.monotonic()
+            if server.consecutive_timeouts >= EJECT_AFTER_TIMEOUTS and not server.is_ejected(now):
+                backoff = min(EJECT_BACKOFF_MAX, EJECT_BACKOFF_MIN * 2 ** server.ejections)
+                server.ejected_until = now + backoff
+                server.ejections += 1
+                server.consecutive_timeouts = 0
+
+    def record_failure(self, address):
+        with self.lock:
+            server = self.servers[address]
+            self.__decrease(server)
+
+    def __decrease(self, server):
+        now = time.monotonic()
+        if now - server.last_decrease >= 1:
+            server.window = max(WINDOW_MIN, server.window // 2)
+            server.last_decrease = now
+
+    def hedge_delay(self, address):
+        '''
+        How long to wait for `address` before hedging: its p95 latency, once enough answers are known.
+        '''
+        with self.lock:
+            if len(self.servers) < 2:
+                return None
+            return self.servers[address].hedge_delay()
+
+    def best(self):
+        '''
+        The healthiest nameserver right now, for callers outside the resolver that need just one.
+        '''
+        now = time.monotonic()
+        with self.lock:
+            servers = [s for s in self.servers.values() if not s.is_ejected(now)] or list(self.servers.values())
+            return min(servers, key=NameserverStats.score).address
+
+    def summary(self):
+        with self.lock:
+            lines = []
+            for server in self.servers.values():
+                p50, p95 = server.percentile(50), server.percentile(95)
+                latency = f'p50 {p50 * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms' if p50 is not None else 'no answers'
+                lines.append(f'{server.address}: {server.queries} queries, {latency}, '
+                             f'window {server.window}, ejected {server.ejections} times')
+            return lines
+
+
+class ResolverStats():
+    '''
+    Thread-safe counters of query outcomes, in total and per nameserver. The resolver records every
+    response or timeout as it happens, so progress reporting can read the totals at any time.
+    '''
+    outcomes = ('noerror', 'nxdomain', 'servfail', 'refused', 'timeout', 'other')
+    rcode_outcomes = {
+        WireUtil.RCODE_NOERROR: 'noerror',
+        WireUtil.RCODE_NXDOMAIN: 'nxdomain',
+        WireUtil.RCODE_SERVFAIL: 'servfail',
+        WireUtil.RCODE_REFUSED: 'refused',
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = dict.fromkeys(self.outcomes, 0)
+        self.nameservers = {}
+
+    def record(self, address, outcome):
+        with self.lock:
+            self.totals[outcome] += 1
+            if address not in self.nameservers:
+                self.nameservers[address] = dict.fromkeys(self.outcomes, 0)
+            self.nameservers[address][outcome] += 1
+
+    def record_response(self, address, response):
+        self.record(address, self.rcode_outcomes.get(response.rcode, 'other'))
+
+    def get(self, outcome, address=None):
+        with self.lock:
+            if address is None:
+                return self.totals[outcome]
+            return self.nameservers.get(address, {}).get(outcome, 0)
+
+    @property
+    def timeouts(self):
+        return self.get('timeout')
+
+    @property
+    def queries(self):
+        '''
+        Queries sent that got a response or timed out, hedges and retries included.
+        '''
+        with self.lock:
+            return sum(self.totals.values())
+
+    def summary(self):
+        with self.lock:
+            def describe(counts):
+                return ', '.join(f'{counts[o]} {o.upper() if o != "timeout" else "timeouts"}' for o in self.outcomes if counts[o])
+            lines = [f'all nameservers: {describe(self.totals) or "no queries"}']
+            for address, counts in self.nameservers.items():
+                lines.append(f'{address}: {describe(counts)}')
+            return lines
+
+
+class PipelinedResolver():
+    '''
+    Resolves names directly against the configured nameservers. Each nameserver gets one
+    UDP socket that all lookups are pipelined over, and a NameserverPool picks the server
+    for every query and retry. When a DnsCache is given, unexpired answers are served from
+    it and only the remaining names go out on the wire.
+
+    With a `hedge_budget` (fraction of queries, e.g. 0.05), a query that has no answer after the
+    server's p95 latency is also sent to the next best server and the first answer wins. Hedges
+    are paid from a token bucket refilled by `hedge_budget` per query, which caps the extra load.
+    '''
+    def __init__(self, nameservers, timeout=REQUEST_TIMEOUT_DNS, retries=REQUEST_RETRIES_DNS, port=53, cache=None, pool=None,
+                 hedge_budget=0.0, stats=None):
+        self.clients = {ns: NameserverClient(ns, port) for ns in nameservers}
+        self.pool = pool or NameserverPool(nameservers)
+        self.stats = stats or ResolverStats()
+        self.cache = cache
+        self.timeout = timeout
+        self.retries = retries
+        self.waiters = deque()
+        self.hedge_budget = hedge_budget
+        self.hedge_tokens = 0.0
+        self.queries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def acquire(self, exclude):
+        while True:
+            address = self.pool.select(exclude)
+            if address is not None:
+                return address
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            await waiter
+
+    def release(self, address):
+        self.pool.release(address)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def take_hedge(self):
+        if self.hedge_tokens < 1:
+            return False
+        self.hedge_tokens -= 1
+        self.hedges += 1
+        return True
+
+    async def resolve(self, name, rdtype):
+        name = name.lower().rstrip('.')
+        if self.cache is not None:
+            cached = self.cache.get(name, rdtype)
+            if cached is not None:
+                return self.cached_answer(name, rdtype, *cached)
+        response = await self.lookup(name, rdtype)
+        if response.rcode == WireUtil.RCODE_NXDOMAIN:
+            self.cache_negative(name, rdtype, STATUS_NXDOMAIN, response)
+            raise NXDomainError(f'The DNS query name does not exist: {name}')
+        values = WireUtil.answer_values(response, rdtype)
+        if not values:
+            self.cache_negative(name, rdtype, STATUS_NOANSWER, response)
+            raise NoAnswerError(f'The DNS response does not contain an answer to {name} {WireUtil.type_names.get(rdtype)}')
+        if self.cache is not None:
+            self.cache.put(name, rdtype, STATUS_ANSWER, values, WireUtil.answer_ttl(response))
+        return values
+
+    def cached_answer(self, name, rdtype, status, values):
+        if status == STATUS_NXDOMAIN:
+            raise NXDomainError(f'The DNS query name does not exist: {name}')
+        if status == STATUS_NOANSWER:
+            raise NoAnswerError(f'The DNS response does not contain an answer to {name} {WireUtil.type_names.get(rdtype)}')
+        return values
+
+    def cache_negative(self, name, rdtype, status, response):
+        if self.cache is None:
+            return
+        ttl = WireUtil.negative_ttl(response)
+        if ttl is not None:
+            self.cache.put(name, rdtype, status, [], ttl)
+
+    async def lookup(self, name, rdtype):
+        '''
+        Send the query to the best available nameserver, moving on to the next best on a timeout
+        or error, until one gives a NOERROR or NXDOMAIN response.
+        '''
+        tried = set()
+        failed = False
+        for _ in range(max(self.retries, len(self.clients))):
+            response, server_failed = await self.exchange(name, rdtype, tried)
+            if response is not None:
+                return response
+            failed = failed or server_failed
+        if failed:
+            raise ServFailError(f'All nameservers failed to answer {name} {WireUtil.type_names.get(rdtype)}')
+        raise ResolverTimeout(f'The resolution lifetime expired after querying {name} {WireUtil.type_names.get(rdtype)}')
+
+    async def exchange(self, name, rdtype, tried):
+        '''
+        One attempt at a query, hedged to a second server if the budget allows. Returns the first
+        usable response (or None) and whether any server answered with an error.
+        '''
+        self.queries += 1
+        self.hedge_tokens = min(HEDGE_BURST, self.hedge_tokens + self.hedge_budget)
+        address = await self.acquire(tried)
+        tried.add(address)
+        primary = asyncio.ensure_future(self.send(address, name, rdtype))
+        pending = {primary}
+        delay = self.pool.hedge_delay(address) if self.hedge_budget else None
+        failed = False
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                delay = None
+                if self.take_hedge():
+                    hedge_address = await self.acquire(tried)
+                    tried.add(hedge_address)
+                    pending.add(asyncio.ensure_future(self.send(hedge_address, name, rdtype)))
+                continue
+            for task in done:
+                response = task.result()
+                if response is None:
+                    continue
+                if response.rcode in (WireUtil.RCODE_NOERROR, WireUtil.RCODE_NXDOMAIN):
+                    for other in pending:
+                        other.cancel()
+                    if task is not primary:
+                        self.hedge_wins += 1
+                    return response, failed
+                failed = True
+        return None, failed
+
+    async def send(self, address, name, rdtype):
+        start = time.monotonic()
+        try:
+            response = await self.clients[address].query(name, rdtype, self.timeout)
+        except (asyncio.TimeoutError, OSError, EOFError, WireError, struct.error):
+            self.pool.record_timeout(address)
+            self.stats.record(address, 'timeout')
+            return None
+        finally:
+            self.release(address)
+        self.stats.record_response(address, response)
+        if response.rcode in (WireUtil.RCODE_NOERROR, WireUtil.RCODE_NXDOMAIN):
+            self.pool.record_answer(address, time.monotonic() - start)
+        else:
+            self.pool.record_failure(address)
+        return response
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+
+
+class FairQueue():
+    '''
+    Round-robin view over the job streams of several targets. Each get() takes the next job from
+    the next stream that has one, so every target's permutations advance at the same rate. A
+    stream is dropped once exhausted. finished() hands a resolved job back to the `done` callback
+    of the stream it came from.
+
+    A name generated by more than one target is only handed out once. The later entries are
+    held back and, once the first is finished, get a copy of its results and are passed to
+    their own stream's callback. Every entry for the name shares a `sources` list of the
+    (brand, fuzzer) pairs that generated it. Held back entries are reported to `progress` as
+    done, since no worker will see them, and counted in `duplicates`, whether the name repeats
+    within one target (a www. variant equal to another permutation) or across targets.
+
+    A 'www prefix' entry is held back while its base name is being resolved and only queued, in
+    a ready deque get() drains first, once the base name turns out to exist. If it does not,
+    the entry is finished as not existing without a lookup and counted in `skipped`. No worker
+    has to wait for the base name.
+
+    Once `limit` jobs have been handed out, or `time_budget` seconds have passed, get() acts as
+    if every stream were exhausted, so the resolver finishes what is in flight and stops.
+    `stopped` then says which budget ran out.
+    '''
+    def __init__(self, streams=(), progress=None, limit=None, time_budget=None):
+        self.streams = deque((iter(jobs), None, None) for jobs in streams)
+        self.progress = progress
+        self.limit = limit
+        self.deadline = time.monotonic() + time_budget if time_budget is not None else None
+        self.handed_out = 0
+        self.stopped = None
+        # name -> [(done, entry), ...] while the first entry is being resolved, then the
+        # finished first entry if it exists, or False
+        self.names = {}
+        # base name -> [(done, entry, brand), ...] of www. variants waiting for it
+        self.held = {}
+        self.ready = deque()
+        self.duplicates = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def add(self, jobs, done=None, brand=None):
+        with self.lock:
+            self.streams.append((iter(jobs), done, brand))
+
+    def get(self, block=False):
+        with self.lock:
+            if self.limit is not None and self.handed_out >= self.limit:
+                self.stopped = self.stopped or 'permutation limit'
+                raise queue.Empty
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.stopped = self.stopped or 'time budget'
+                raise queue.Empty
+            while self.ready or self.streams:
+                if self.ready:
+                    done, job, brand = self.ready.popleft()
+                else:
+                    jobs, done, brand = self.streams[0]
+                    self.streams.rotate(-1)
+                    try:
+                        job = next(jobs)
+                    except StopIteration:
+                        self.streams.pop()
+                        continue
+                    if job.get('fuzzer') == 'www prefix' and job['domain-name'].startswith('www.'):
+                        base = self.names.get(job['domain-name'][4:])
+                        if isinstance(base, list):
+                            self.held.setdefault(job['domain-name'][4:], []).append((done, job, brand))
+                            continue
+                        if base is False:
+                            self.skip(done, job)
+                            continue
+                name = job['domain-name']
+                first = self.names.get(name)
+                if first is None:
+                    job.sources = [(brand, job.get('fuzzer'))]
+                    self.names[name] = [(done, job)]
+                    self.handed_out += 1
+                    return job
+                self.duplicates += 1
+                if isinstance(first, list):
+                    first[0][1].sources.append((brand, job.get('fuzzer')))
+                    first.append((done, job))
+                elif first is not False:
+                    first.sources.append((brand, job.get('fuzzer')))
+                    self.fan_out(first, done, job, True)
+                elif done is not None:
+                    done(job, False)
+                if self.progress is not None:
+                    self.progress.advance()
+        raise queue.Empty
+
+    def skip(self, done, job):
+        self.skipped += 1
+        if done is not None:
+            done(job, False)
+        if self.progress is not None:
+            self.progress.advance()
+
+    def fan_out(self, first, done, job, exists):
+        if job is not first:
+            job.data = dict(first.data) if first.data is not None else None
+            job.sources = first.sources
+        if done is not None:
+            done(job, exists)
+
+    def finished(self, job, exists):
+        with self.lock:
+            waiting = self.names.get(job['domain-name'])
+            self.names[job['domain-name']] = job if exists else False
+            held = self.held.pop(job['domain-name'], ())
+            if exists:
+                self.ready.extend(held)
+        for done, entry in waiting or ():
+            self.fan_out(job, done, entry, exists)
+        if not exists:
+            for done, entry, _ in held:
+                self.skip(done, entry)
+
+
+class ResolverThread(threading.Thread):
+    '''
+    Resolves the domain entries waiting in a job queue (a queue.Queue, or a FairQueue shared by
+    several targets) on an asyncio event loop, keeping up to `concurrency` lookups in flight.
+    Results are written to the dns-ns, dns-a, dns-aaaa and dns-mx keys of each entry, the same
+    way dnstwist's DomainThread does with extdns enabled.
+
+    A 'tld-swap' entry is only resolved once a one-off NS probe shows its TLD exists, and is
+    skipped without sending any queries otherwise. (A FairQueue likewise holds 'www prefix'
+    entries back until their base name is known to exist.) With a
+    ZoneUtil.ZoneIndex, names under an indexed zone that are not delegated there are skipped too, and
+    likewise with a BloomUtil.BloomFilter for names it certainly does not contain.
+
+    Every finished entry is reported to `progress` (an IOUtil.ProgressSink), which is told the
+    stage is over once the thread exits, and to the finished() method of `jobs` if it has one.
+    `undecided` maps the names with a lookup that timed out or got SERVFAIL to the keys affected,
+    so a later run is not mistaken for a change in their records.
+    '''
+    def __init__(self, jobs, nameservers, concurrency=DNS_CONCURRENCY_DEFAULT, debug=False, port=53, cache=None, pool=None,
+                 hedge_budget=0.0, stats=None, progress=None, zone_index=None, bloom_filter=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.jobs = jobs
+        self.finished = getattr(jobs, 'finished', None)
+        self.nameservers = nameservers
+        self.port = port
+        self.cache = cache
+        self.pool = pool
+        self.hedge_budget = hedge_budget
+        self.stats = stats
+        self.progress = progress
+        self.zone_index = zone_index
+        self.bloom_filter = bloom_filter
+        self.resolver = None
+        self.concurrency = concurrency
+        self.debug = debug
+        self.kill_received = False
+        self.delegations = {}
+        self.skipped = 0
+        self.zone_skipped = 0
+        self.bloom_skipped = 0
+        # name -> DNS keys of it that got no definite answer (see resolve_domain)
+        self.undecided = {}
+
+    def __debug(self, text):
+        if self.debug:
+            print(str(text), file=sys.stderr, flush=True)
+
+    def stop(self):
+        self.kill_received = True
+
+    def run(self):
+        try:
+            asyncio.run(self.resolve_jobs())
+        finally:
+            if self.progress is not None:
+                if getattr(self.jobs, 'stopped', None):
+                    self.progress.stop()
+                self.progress.finish()
+
+    async def resolve_jobs(self):
+        resolver = PipelinedResolver(self.nameservers, port=self.port, cache=self.cache, pool=self.pool,
+                                     hedge_budget=self.hedge_budget, stats=self.stats)
+        self.resolver = resolver
+        workers = [asyncio.create_task(self.worker(resolver)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            resolver.close()
+            if self.cache is not None:
+                self.cache.flush()
+
+    async def worker(self, resolver):
+        while not self.kill_received:
+            try:
+                domain = self.jobs.get(block=False)
+            except queue.Empty:
+                return
+            exists = True
+            try:
+                if self.bloom_filter is not None and self.bloom_filter.is_delegated(domain['domain-name']) is False:
+                    exists = False
+                    self.bloom_skipped += 1
+                elif self.zone_index is not None and self.zone_index.is_delegated(domain['domain-name']) is False:
+                    exists = False
+                    self.zone_skipped += 1
+                elif await self.parent_exists(resolver, domain):
+                    exists = await self.resolve_domain(resolver, domain)
+                else:
+                    exists = False
+                    self.skipped += 1
+            finally:
+                if self.finished is not None:
+                    self.finished(domain, exists)
+                if self.progress is not None:
+                    self.progress.advance()
+
+    async def parent_exists(self, resolver, domain):
+        name = domain['domain-name']
+        if domain.get('fuzzer') == 'tld-swap':
+            tld = name.rsplit('.', 1)[-1]
+            if tld not in self.delegations:
+                self.delegations[tld] = asyncio.ensure_future(self.probe_delegation(resolver, tld))
+            return await self.delegations[tld]
+        return True
+
+    async def probe_delegation(self, resolver, tld):
+        try:
+            await resolver.resolve(tld, WireUtil.TYPE_NS)
+        except NXDomainError:
+            return False
+        except ResolverError as e:
+            self.__debug(e)
+        return True
+
+    async def resolve_domain(self, resolver, domain):
+        name = domain['domain-name']
+        nxdomain = False
+        dns_ns = False
+        # keys without a definite answer: the lookup timed out or failed, or was never sent
+        undecided = []
+
+        try:
+            domain['dns-ns'] = answer_to_list(await resolver.resolve(name, WireUtil.TYPE_NS))
+            dns_ns = True
+        except NXDomainError:
+            nxdomain = True
+        except NoAnswerError as e:
+            self.__debug(e)
+        except ServFailError:
+            domain['dns-ns'] = ['!ServFail']
+            undecided.append('dns-ns')
+        except ResolverError as e:
+            self.__debug(e)
+            undecided.append('dns-ns')
+
+        if nxdomain:
+            return False
+
+        for key, rdtype in (('dns-a', WireUtil.TYPE_A), ('dns-aaaa', WireUtil.TYPE_AAAA)):
+            try:
+                domain[key] = answer_to_list(await resolver.resolve(name, rdtype))
+            except NoAnswerError as e:
+                self.__debug(e)
+            except ServFailError:
+                domain[key] = ['!ServFail']
+                undecided.append(key)
+            except ResolverError as e:
+                self.__debug(e)
+                undecided.append(key)
+
+        if dns_ns:
+            try:
+                domain['dns-mx'] = answer_to_list(await resolver.resolve(name, WireUtil.TYPE_MX))
+            except NoAnswerError as e:
+                self.__debug(e)
+            except ServFailError:
+                domain['dns-mx'] = ['!ServFail']
+                undecided.append('dns-mx')
+            except ResolverError as e:
+                self.__debug(e)
+                undecided.append('dns-mx')
+        elif 'dns-ns' in undecided:
+            undecided.append('dns-mx')
+
+        if undecided:
+            self.undecided[name] = tuple(undecided)
+        return True
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+
+STATE_FILE = 'state.db'
+STATE_MAX_AGE_DEFAULT = 7
+DNS_KEYS = ('dns-ns', 'dns-a', 'dns-aaaa', 'dns-mx')
+WHOIS_KEYS = ('whois-created', 'whois-registrar')
+
+CHANGE_NEW = 'new'
+CHANGE_CHANGED = 'changed'
+CHANGE_GONE = 'gone'
+CHANGE_STALE = 'stale'
+CHANGE_NONE = 'unchanged'
+
+
+def dns_answer(domain_entry, undecided=()):
+    '''
+    The DNS records of the entry as stored. The keys in `undecided` (see
+    ResolverUtil.ResolverThread.undecided) map to None: their lookup got no definite answer.
+    '''
+    answer = {key: sorted(domain_entry[key]) for key in DNS_KEYS if key in domain_entry and key not in undecided}
+    answer.update((key, None) for key in undecided)
+    return answer
+
+
+def definite(answer):
+    return {key: value for key, value in answer.items() if value is not None}
+
+
+def dns_changes(old, new):
+    '''
+    describe_changes() of two stored DNS answers, over the keys that got a definite answer in
+    both. A missing key is a definite empty answer.
+    '''
+    keys = [key for key in DNS_KEYS if old.get(key, []) is not None and new.get(key, []) is not None]
+    return describe_changes({key: old[key] for key in keys if key in old},
+                            {key: new[key] for key in keys if key in new})
+
+
+def merge_answer(old, new):
+    '''
+    `new`, with each key it got no definite answer for taken from `old` instead.
+    '''
+    merged = dict(new)
+    for key, value in new.items():
+        if value is None:
+            if key in old:
+                merged[key] = old[key]
+            else:
+                del merged[key]
+    return merged
+
+
+def whois_answer(domain_entry):
+    return {key: domain_entry[key] for key in WHOIS_KEYS if key in domain_entry}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def describe_changes(old, new):
+    '''
+    "key old -> new" for every key whose value differs between the two dicts.
+    '''
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        if old.get(key) != new.get(key):
+            before = old.get(key, '')
+            after = new.get(key, '')
+            before = ' '.join(before) if isinstance(before, list) else before
+            after = ' '.join(after) if isinstance(after, list) else after
+            changes.append(f"{key} {before or '-'} -> {after or '-'}")
+    return changes
+
+
+class RunState():
+    '''
+    What previous runs found for each brand, kept in an SQLite file in `directory` so a run only
+    repeats the expensive stages for names that are new or whose DNS answer changed. For every
+    discovered name it records the DNS answer, the WHOIS data, the SHA-256 of the screenshot
+    (a copy of which is kept in `directory`/screenshots) and its similarity score. Unchanged
+    names are rechecked anyway once their last check is `max_age` seconds old.
+
+    The `undecided` names and keys of the resolver (ResolverUtil.ResolverThread.undecided) are
+    left out of every comparison: a lookup that timed out says nothing about the records.
+    '''
+    def __init__(self, directory, max_age=STATE_MAX_AGE_DEFAULT * 86400):
+        self.directory = directory
+        self.max_age = max_age
+        self.screenshots = os.path.join(directory, 'screenshots')
+        os.makedirs(self.screenshots, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, STATE_FILE))
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS domains ('
+                        'brand TEXT NOT NULL, name TEXT NOT NULL, dns TEXT NOT NULL, whois TEXT, '
+                        'screenshot_hash TEXT, ssim REAL, logo TEXT, first_seen REAL NOT NULL, '
+                        'checked REAL NOT NULL, PRIMARY KEY (brand, name))')
+        self.db.commit()
+        self.previous = {}
+        # (brand, name) -> (change, details) of the current run, set by compare()
+        self.changes = {}
+
+    def load(self, brand):
+        if brand not in self.previous:
+            rows = self.db.execute('SELECT name, dns, whois, screenshot_hash, ssim, logo, first_seen, checked '
+                                   'FROM domains WHERE brand = ?', (brand,))
+            self.previous[brand] = {
+                name: {'dns': json.loads(dns), 'whois': json.loads(whois) if whois is not None else None,
+                       'screenshot_hash': screenshot_hash, 'ssim': ssim, 'logo': logo,
+                       'first_seen': first_seen, 'checked': checked}
+                for name, dns, whois, screenshot_hash, ssim, logo, first_seen, checked in rows}
+        return self.previous[brand]
+
+    def discovered(self, razzle):
+        return [domain_entry for domain_entry in razzle.resolved_domains()
+                if domain_entry['domain-name'] != razzle.domain]
+
+    def compare(self, razzles, undecided={}):
+        '''
+        Classify the names each razzle resolved as new, changed (different DNS answer), stale
+        (unchanged but due for a recheck) or unchanged. Returns the count of each.
+        '''
+        now = time.time()
+        counts = {}
+        for razzle in razzles:
+            previous = self.load(razzle.domain)
+            for domain_entry in self.discovered(razzle):
+                row = previous.get(domain_entry['domain-name'])
+                details = []
+                if row is None:
+                    change = CHANGE_NEW
+                else:
+                    details = dns_changes(row['dns'], dns_answer(domain_entry, undecided.get(domain_entry['domain-name'], ())))
+                    if details:
+                        change = CHANGE_CHANGED
+                    elif now - row['checked'] >= self.max_age:
+                        change = CHANGE_STALE
+                    else:
+                        change = CHANGE_NONE
+                self.changes[(razzle.domain, domain_entry['domain-name'])] = (change, details)
+                counts[change] = counts.get(change, 0) + 1
+        return counts
+
+    def unchanged(self, razzle, domain_entry):
+        '''
+        The stored row of a name whose earlier results can be reused, or None.
+        '''
+        key = (razzle.domain, domain_entry['domain-name'])
+        if key not in self.changes or self.changes[key][0] != CHANGE_NONE:
+            return None
+        return self.load(razzle.domain)[domain_entry['domain-name']]
+
+    def restore_whois(self, razzles):
+        '''
+        Copy the stored WHOIS data into the entries of unchanged names and return those names,
+        which need no new query. A name some razzle saw change is queried again.
+        '''
+        restored = {}
+        requery = set()
+        for razzle in razzles:
+            for domain_entry in self.discovered(razzle):
+                name = domain_entry['domain-name']
+                row = self.unchanged(razzle, domain_entry)
+                if row is None or row['whois'] is None:
+                    requery.add(name)
+                else:
+                    restored.setdefault(name, []).append((domain_entry, row['whois']))
+        for name in list(restored):
+            if name in requery:
+                del restored[name]
+                continue
+            for domain_entry, whois in restored[name]:
+                for key, value in whois.items():
+                    domain_entry[key] = value
+        return set(restored)
+
+    def restore_screenshot(self, razzle, domain_entry):
+        '''
+        Fill in the stored similarity score of an unchanged name and point it at the kept copy
+        of its screenshot. Returns False when the name has to be captured again.
+        '''
+        row = self.unchanged(razzle, domain_entry)
+        if row is None or row['screenshot_hash'] is None:
+            return False
+        screenshot = os.path.join(self.screenshots, domain_entry['domain-name'] + '.png')
+        if not os.path.isfile(screenshot):
+            return False
+        if razzle.model is not None and row['logo'] == "Logo presence not checked.":
+            return False
+        domain_entry['ssim-score'] = row['ssim']
+        domain_entry['logo-detection'] = row['logo']
+        domain_entry['screenshot'] = screenshot
+        return True
+
+    def update(self, razzles, complete=True, whois=True, screenshots=True, undecided={}):
+        '''
+        Store the results of this run and return the delta report rows (change, brand, domain
+        name, details) of the names that are new or changed, including a changed WHOIS record
+        or screenshot. When the run was `complete`, names that no longer resolve are reported
+        as gone and dropped, unless their lookup was undecided. `whois` and `screenshots` tell
+        whether those stages ran; if not, the stored values are kept and the time of the last
+        check is not advanced, so a later run with both stages rechecks the name.
+        '''
+        now = time.time()
+        delta = []
+        for razzle in razzles:
+            previous = self.load(razzle.domain)
+            seen = set()
+            for domain_entry in self.discovered(razzle):
+                name = domain_entry['domain-name']
+                seen.add(name)
+                row = previous.get(name) or {'whois': None, 'screenshot_hash': None, 'ssim': None,
+                                             'logo': None, 'first_seen': now, 'checked': now}
+                change, details = self.changes.get((razzle.domain, name), (CHANGE_NEW, []))
+                answer = dns_answer(domain_entry, undecided.get(name, ()))
+                stored = merge_answer(previous[name]['dns'], answer) if name in previous else answer
+                details = list(details)
+                rechecked = change != CHANGE_NONE
+                whois_data, screenshot_hash = row['whois'], row['screenshot_hash']
+                ssim, logo = row['ssim'], row['logo']
+                if whois and rechecked:
+                    whois_data = whois_answer(domain_entry)
+                    if row['whois'] is not None:
+                        details += describe_changes(row['whois'], whois_data)
+                screenshot = domain_entry.get('screenshot')
+                if screenshots and screenshot and os.path.isfile(screenshot) and \
+                        os.path.dirname(os.path.abspath(screenshot)) != os.path.abspath(self.screenshots):
+                    screenshot_hash = file_hash(screenshot)
+                    shutil.copyfile(screenshot, os.path.join(self.screenshots, name + '.png'))
+                    if row['screenshot_hash'] is not None and row['screenshot_hash'] != screenshot_hash:
+                        details.append('screenshot')
+                    ssim, logo = domain_entry.get('ssim-score'), domain_entry.get('logo-detection')
+                if change == CHANGE_NEW:
+                    delta.append((CHANGE_NEW, razzle.domain, name,
+                                  '; '.join(f"{key} {' '.join(value)}" for key, value in definite(answer).items())))
+                elif details:
+                    delta.append((CHANGE_CHANGED, razzle.domain, name, '; '.join(details)))
+                if whois and screenshots:
+                    checked = now if rechecked else row['checked']
+                elif change in (CHANGE_NEW, CHANGE_CHANGED):
+                    # a stage was skipped, so the name is due for a recheck on the next run
+                    checked = 0
+                else:
+                    checked = row['checked']
+                self.db.execute('INSERT OR REPLACE INTO domains VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                (razzle.domain, name, json.dumps(stored),
+                                 json.dumps(whois_data) if whois_data is not None else None,
+                                 screenshot_hash, ssim, logo, row['first_seen'], checked))
+            if complete:
+                for name in sorted(set(previous) - seen - set(undecided)):
+                    delta.append((CHANGE_GONE, razzle.domain, name, ''))
+                    self.db.execute('DELETE FROM domains WHERE brand = ? AND name = ?', (razzle.domain, name))
+        self.db.commit()
+        self.previous = {}
+        return delta
+
+    def close(self):
+        self.db.close()
+
+
+def write_delta_report(delta, path):
+    with open(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['change', 'brand', 'domain-name', 'details'])
+        writer.writerows(delta)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import os
+import dnstwist
+
+
+PSL_END_ICANN = '// ===END ICANN DOMAINS==='
+
+
+def psl_path():
+    '''
+    The public suffix list snapshot shipped with the tld package, or None.
+    '''
+    try:
+        import tld
+    except ImportError:
+        return None
+    path = os.path.join(os.path.dirname(tld.__file__), 'res', 'effective_tld_names.dat.txt')
+    return path if os.path.exists(path) else None
+
+
+def encode_suffix(suffix):
+    try:
+        return dnstwist.idna.encode(suffix.lower()).decode()
+    except Exception:
+        return None
+
+
+class SuffixIndex():
+    '''
+    The top-level domains in the root zone and the public suffixes under them (co.uk, com.au,
+    ...) from the ICANN section of the public suffix list, IDNA encoded. Tells which names can be
+    registered at all and splits a name at its public suffix, so a tld-swap of acme.co.uk
+    gives acme.com rather than acme.co.com.
+    '''
+    def __init__(self, tlds, rules=(), wildcards=(), exceptions=()):
+        self.tlds = set(tlds)
+        self.rules = {rule for rule in rules if rule.rsplit('.', 1)[-1] in self.tlds} | self.tlds
+        # *.ck is kept as ck, !www.ck as www.ck
+        self.wildcards = set(wildcards)
+        self.exceptions = set(exceptions)
+
+    @classmethod
+    def load(cls, tld_file=None, psl_file=None):
+        '''
+        Build the index from an IANA tlds-alpha-by-domain.txt and a public suffix list file. TLDs
+        with a rule in the list count as delegated too, so a stale TLD file does not drop new TLDs.
+        '''
+        tlds, rules, wildcards, exceptions = set(), set(), set(), set()
+        if tld_file is not None:
+            with open(tld_file) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        tlds.add(line.lower())
+        if psl_file is not None:
+            with open(psl_file, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line == PSL_END_ICANN:
+                        break
+                    if not line or line.startswith('//'):
+                        continue
+                    if line.startswith('!'):
+                        exception = encode_suffix(line[1:])
+                        if exception is not None:
+                            exceptions.add(exception)
+                        continue
+                    wildcard = line.startswith('*.')
+                    rule = encode_suffix(line[2:] if wildcard else line)
+                    if rule is None:
+                        continue
+                    (wildcards if wildcard else rules).add(rule)
+                    if '.' not in rule:
+                        tlds.add(rule)
+        return cls(tlds, rules, wildcards, exceptions)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def is_suffix(self, suffix):
+        '''
+        Whether the encoded `suffix` is a TLD or public suffix names can be registered under.
+        '''
+        return suffix in self.rules or (
+            '.' in suffix and suffix.split('.', 1)[1] in self.wildcards and suffix not in self.exceptions)
+
+    def public_suffix(self, name):
+        '''
+        The longest public suffix of the encoded `name`, or its last label if none matches.
+        '''
+        labels = name.split('.')
+        for i in range(len(labels)):
+            candidate = '.'.join(labels[i:])
+            if candidate in self.exceptions:
+                return '.'.join(labels[i + 1:])
+            if candidate in self.rules or (i + 1 < len(labels) and '.'.join(labels[i + 1:]) in self.wildcards):
+                return candidate
+        return labels[-1]
+
+    def split(self, name):
+        '''
+        (labels before the public suffix, public suffix) of `name`.
+        '''
+        suffix = self.public_suffix(name)
+        return name[:-len(suffix) - 1], suffix
+
+    def registrable_domain(self, name):
+        '''
+        The name registered at the registry for the encoded `name`, e.g. acme.co.uk for
+        www.acme.co.uk, or None if `name` is a public suffix.
+        '''
+        prefix, suffix = self.split(name)
+        if not prefix:
+            return None
+        return prefix.rsplit('.', 1)[-1] + '.' + suffix
+
+    def is_registrable(self, name):
+        '''
+        Whether the encoded `name` is under a delegated TLD and is not itself a public suffix.
+        '''
+        if name.rsplit('.', 1)[-1] not in self.tlds:
+            return False
+        return self.public_suffix(name) != name
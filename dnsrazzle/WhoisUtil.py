@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+WHOIS_RATE_INITIAL = 1.0
+WHOIS_RATE_MIN = 0.05
+WHOIS_RATE_MAX = 10.0
+WHOIS_RATE_STEP = 0.2
+WHOIS_BURST = 2
+WHOIS_CONCURRENCY_INITIAL = 2
+WHOIS_CONCURRENCY_MAX = 8
+# answers in a row before a registry may have one more query in flight
+WHOIS_CONCURRENCY_STEP = 10
+# errors run_whois records that mean the registry is rate limiting us
+WHOIS_THROTTLE_ERRORS = ('WhoisQuotaExceeded', 'WhoisCommandTimeout')
+# times a throttled query is queued again, at the registry's lowered rate
+WHOIS_RETRIES = 2
+
+
+def registry_of(domain):
+    '''
+    The group a WHOIS query is scheduled in: the TLD, which decides the WHOIS server.
+    '''
+    return domain.rsplit('.', 1)[-1].lower()
+
+
+class RegistryStats():
+    '''
+    Pending queries of one registry, its token bucket of `rate` queries a second, and the cap on
+    how many of its queries may be in flight. Both grow additively with answers and are halved
+    when the registry refuses us or times out.
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.pending = collections.deque()
+        self.rate = WHOIS_RATE_INITIAL
+        self.tokens = WHOIS_BURST
+        self.last_refill = time.monotonic()
+        self.concurrency = WHOIS_CONCURRENCY_INITIAL
+        self.inflight = 0
+        self.answers_in_row = 0
+        self.last_decrease = 0
+        self.queries = 0
+        self.throttled = 0
+
+    def refill(self, now):
+        self.tokens = min(WHOIS_BURST, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def wait_time(self):
+        return (1 - self.tokens) / self.rate
+
+
+class WhoisScheduler():
+    '''
+    Runs WHOIS queries from all brands on one pool of threads, grouped by registry so a strict
+    registry slowing down does not hold back the others. Each registry gets its own token
+    bucket and concurrency limit, learned from its answers and refusals like the windows of
+    ResolverUtil.NameserverPool. A throttled query goes back to the end of its registry's queue,
+    up to WHOIS_RETRIES times, so the lowered rate still gets its data.
+    '''
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.registries = {}
+        self.remaining = 0
+        self.inflight = 0
+        # domain name -> times its query was queued again
+        self.retries = collections.Counter()
+
+    def add(self, domain_entry):
+        with self.condition:
+            name = registry_of(domain_entry['domain-name'])
+            if name not in self.registries:
+                self.registries[name] = RegistryStats(name)
+            self.registries[name].pending.append(domain_entry)
+            self.remaining += 1
+            self.condition.notify()
+
+    def next(self):
+        '''
+        Block until a registry has a pending query, a token and room in its concurrency limit,
+        and return (registry, domain entry), or None once every query has been handed out and
+        none in flight can be queued again.
+        '''
+        with self.condition:
+            while True:
+                if not self.remaining and not self.inflight:
+                    return None
+                now = time.monotonic()
+                wait = None
+                for registry in self.registries.values():
+                    if not registry.pending or registry.inflight >= registry.concurrency:
+                        continue
+                    registry.refill(now)
+                    if registry.tokens >= 1:
+                        registry.tokens -= 1
+                        registry.inflight += 1
+                        registry.queries += 1
+                        self.remaining -= 1
+                        self.inflight += 1
+                        return registry, registry.pending.popleft()
+                    wait = min(wait, registry.wait_time()) if wait is not None else registry.wait_time()
+                self.condition.wait(wait)
+
+    def done(self, registry, domain_entry, throttled):
+        '''
+        Adjust the registry's limits to the outcome of a query and return whether the query was
+        queued again.
+        '''
+        retried = False
+        with self.condition:
+            registry.inflight -= 1
+            self.inflight -= 1
+            if throttled:
+                registry.throttled += 1
+                registry.answers_in_row = 0
+                now = time.monotonic()
+                if now - registry.last_decrease >= 1:
+                    registry.rate = max(WHOIS_RATE_MIN, registry.rate / 2)
+                    registry.concurrency = max(1, registry.concurrency // 2)
+                    registry.tokens = min(registry.tokens, 0)
+                    registry.last_decrease = now
+                name = domain_entry['domain-name']
+                if self.retries[name] < WHOIS_RETRIES:
+                    self.retries[name] += 1
+                    registry.pending.append(domain_entry)
+                    self.remaining += 1
+                    retried = True
+            else:
+                registry.rate = min(WHOIS_RATE_MAX, registry.rate + WHOIS_RATE_STEP)
+                registry.answers_in_row += 1
+                if registry.answers_in_row % WHOIS_CONCURRENCY_STEP == 0:
+                    registry.concurrency = min(WHOIS_CONCURRENCY_MAX, registry.concurrency + 1)
+            self.condition.notify_all()
+        return retried
+
+    def run(self, query, threads, finished=None):
+        '''
+        Call `query(domain_entry)` for every added entry on `threads` worker threads. `query`
+        returns whether the registry throttled the request. `finished(domain_entry)` is called
+        once per entry, after its last attempt.
+        '''
+        def worker():
+            while True:
+                job = self.next()
+                if job is None:
+                    return
+                registry, domain_entry = job
+                throttled = False
+                try:
+                    throttled = query(domain_entry)
+                finally:
+                    retried = self.done(registry, domain_entry, throttled)
+                if not retried and finished is not None:
+                    finished(domain_entry)
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [executor.submit(worker) for _ in range(max(threads, 1))]
+            for future in futures:
+                future.result()
+
+    def summary(self):
+        with self.condition:
+            return [f'.{registry.name}: {registry.queries} queries, throttled {registry.throttled} times, '
+                    f'{registry.rate:.2f} queries/s, {registry.concurrency} in flight'
+                    for registry in sorted(self.registries.values(), key=lambda r: -r.queries)]
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import ipaddress
+import struct
+
+
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_MX = 15
+TYPE_AAAA = 28
+TYPE_OPT = 41
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+RCODE_REFUSED = 5
+
+FLAG_QR = 0x8000
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+FLAG_RA = 0x0080
+
+CLASS_IN = 1
+EDNS_PAYLOAD = 1232
+
+type_names = {
+    TYPE_A: 'A', TYPE_NS: 'NS', TYPE_CNAME: 'CNAME', TYPE_SOA: 'SOA', TYPE_MX: 'MX', TYPE_AAAA: 'AAAA',
+}
+
+HEADER = struct.Struct('!HHHHHH')
+RR_FIXED = struct.Struct('!HHIH')
+
+
+class WireError(Exception):
+    pass
+
+
+class Record():
+    __slots__ = ('name', 'rdtype', 'ttl', 'value')
+
+    def __init__(self, name, rdtype, ttl, value):
+        self.name = name
+        self.rdtype = rdtype
+        self.ttl = ttl
+        self.value = value
+
+    def __repr__(self):
+        return f'{self.name} {self.ttl} {type_names.get(self.rdtype, self.rdtype)} {self.value}'
+
+
+class Response():
+    __slots__ = ('id', 'flags', 'qname', 'qtype', 'answer', 'authority')
+
+    def __init__(self, id, flags, qname, qtype, answer, authority):
+        self.id = id
+        self.flags = flags
+        self.qname = qname
+        self.qtype = qtype
+        self.answer = answer
+        self.authority = authority
+
+    @property
+    def rcode(self):
+        return self.flags & 0x000f
+
+    @property
+    def truncated(self):
+        return bool(self.flags & FLAG_TC)
+
+
+def encode_name(name):
+    '''
+    Encode a dotted, already punycoded name into uncompressed wire format.
+    '''
+    wire = bytearray()
+    for label in name.rstrip('.').split('.'):
+        if not label:
+            continue
+        label = label.encode('ascii')
+        if len(label) > 63:
+            raise WireError(f'label too long in {name}')
+        wire.append(len(label))
+        wire += label
+    wire.append(0)
+    return bytes(wire)
+
+
+def build_query(qid, name, rdtype, payload=EDNS_PAYLOAD):
+    '''
+    Build a recursive query for one name and record type, advertising an EDNS0 UDP payload size.
+    '''
+    header = HEADER.pack(qid, FLAG_RD, 1, 0, 0, 1 if payload else 0)
+    question = encode_name(name) + struct.pack('!HH', rdtype, CLASS_IN)
+    if not payload:
+        return header + question
+    opt = b'\x00' + RR_FIXED.pack(TYPE_OPT, payload, 0, 0)
+    return header + question + opt
+
+
+def encode_rdata(rdtype, value):
+    if rdtype == TYPE_A:
+        return ipaddress.IPv4Address(value).packed
+    if rdtype == TYPE_AAAA:
+        return ipaddress.IPv6Address(value).packed
+    if rdtype in (TYPE_NS, TYPE_CNAME):
+        return encode_name(value)
+    if rdtype == TYPE_MX:
+        preference, exchange = value.split(' ')
+        return struct.pack('!H', int(preference)) + encode_name(exchange)
+    if rdtype == TYPE_SOA:
+        mname, rname, *timers = value.split(' ')
+        return encode_name(mname) + encode_name(rname) + struct.pack('!IIIII', *map(int, timers))
+    raise WireError(f'cannot encode record type {rdtype}')
+
+
+def build_response(qid, name, rdtype, rcode=RCODE_NOERROR, answer=(), authority=(), truncated=False):
+    '''
+    Build a response to a single question. `answer` and `authority` hold Record instances.
+    '''
+    flags = FLAG_QR | FLAG_RD | FLAG_RA | rcode
+    if truncated:
+        flags |= FLAG_TC
+        answer = authority = ()
+    wire = bytearray(HEADER.pack(qid, flags, 1, len(answer), len(authority), 0))
+    wire += encode_name(name) + struct.pack('!HH', rdtype, CLASS_IN)
+    for record in list(answer) + list(authority):
+        rdata = encode_rdata(record.rdtype, record.value)
+        wire += encode_name(record.name) + RR_FIXED.pack(record.rdtype, CLASS_IN, record.ttl, len(rdata)) + rdata
+    return bytes(wire)
+
+
+def decode_name(data, offset):
+    '''
+    Decode a possibly compressed name at `offset`, returning it lowercased without the trailing dot
+    together with the offset just past it.
+    '''
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise WireError('name runs past end of message')
+        length = data[offset]
+        if length & 0xc0 == 0xc0:
+            if offset + 1 >= len(data):
+                raise WireError('truncated compression pointer')
+            if end is None:
+                end = offset + 2
+            jumps += 1
+            if jumps > 64:
+                raise WireError('compression loop')
+            offset = ((length & 0x3f) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', 'replace').lower())
+        offset += length
+    return '.'.join(labels), end if end is not None else offset
+
+
+def decode_rdata(data, offset, rdtype, rdlength):
+    if rdtype == TYPE_A and rdlength == 4:
+        return str(ipaddress.IPv4Address(data[offset:offset + 4]))
+    if rdtype == TYPE_AAAA and rdlength == 16:
+        return str(ipaddress.IPv6Address(data[offset:offset + 16]))
+    if rdtype in (TYPE_NS, TYPE_CNAME):
+        return decode_name(data, offset)[0]
+    if rdtype == TYPE_MX:
+        preference = struct.unpack_from('!H', data, offset)[0]
+        return f'{preference} {decode_name(data, offset + 2)[0]}'
+    if rdtype == TYPE_SOA:
+        mname, pos = decode_name(data, offset)
+        rname, pos = decode_name(data, pos)
+        serial, refresh, retry, expire, minimum = struct.unpack_from('!IIIII', data, pos)
+        return f'{mname} {rname} {serial} {refresh} {retry} {expire} {minimum}'
+    return data[offset:offset + rdlength].hex()
+
+
+def parse_records(data, offset, count):
+    records = []
+    for _ in range(count):
+        name, offset = decode_name(data, offset)
+        if offset + RR_FIXED.size > len(data):
+            raise WireError('truncated resource record')
+        rdtype, rdclass, ttl, rdlength = RR_FIXED.unpack_from(data, offset)
+        offset += RR_FIXED.size
+        if offset + rdlength > len(data):
+            raise WireError('truncated rdata')
+        if rdtype != TYPE_OPT:
+            records.append(Record(name, rdtype, ttl, decode_rdata(data, offset, rdtype, rdlength)))
+        offset += rdlength
+    return records, offset
+
+
+def parse_query(data):
+    '''
+    Parse the header and first question of a query, returning (id, flags, name, type).
+    '''
+    if len(data) < HEADER.size:
+        raise WireError('message shorter than header')
+    qid, flags, qdcount, _, _, _ = HEADER.unpack_from(data)
+    if flags & FLAG_QR or qdcount < 1:
+        raise WireError('not a query')
+    qname, offset = decode_name(data, HEADER.size)
+    qtype = struct.unpack_from('!H', data, offset)[0]
+    return qid, flags, qname, qtype
+
+
+def parse_response(data):
+    '''
+    Parse the parts of a response the resolver needs: header, question, answer and authority sections.
+    '''
+    if len(data) < HEADER.size:
+        raise WireError('message shorter than header')
+    qid, flags, qdcount, ancount, nscount, _ = HEADER.unpack_from(data)
+    if not flags & FLAG_QR:
+        raise WireError('not a response')
+    offset = HEADER.size
+    qname, qtype = '', 0
+    for _ in range(qdcount):
+        qname, offset = decode_name(data, offset)
+        qtype = struct.unpack_from('!H', data, offset)[0]
+        offset += 4
+    if flags & FLAG_TC:
+        return Response(qid, flags, qname, qtype, [], [])
+    answer, offset = parse_records(data, offset, ancount)
+    authority, offset = parse_records(data, offset, nscount)
+    return Response(qid, flags, qname, qtype, answer, authority)
+
+
+def answer_values(response, rdtype):
+    '''
+    Return the values answering `rdtype` for the question name, following any CNAME chain.
+    '''
+    name = response.qname
+    for _ in range(16):
+        values = [r.value for r in response.answer if r.name == name and r.rdtype == rdtype]
+        if values:
+            return values
+        cnames = [r.value for r in response.answer if r.name == name and r.rdtype == TYPE_CNAME]
+        if not cnames:
+            break
+        name = cnames[0]
+    return []
+
+
+def answer_ttl(response):
+    '''
+    How long a positive answer may be cached: the smallest TTL in the answer section.
+    '''
+    return min((r.ttl for r in response.answer), default=0)
+
+
+def negative_ttl(response):
+    '''
+    How long a negative answer may be cached (RFC 2308): the smaller of the SOA record's TTL and
+    its MINIMUM field, or None when the authority section carries no SOA.
+    '''
+    for record in response.authority:
+        if record.rdtype == TYPE_SOA:
+            return min(record.ttl, int(record.value.split(' ')[-1]))
+    return None
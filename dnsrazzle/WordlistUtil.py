@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import argparse
+import bisect
+import mmap
+import struct
+from .IOUtil import print_good
+
+
+WORDLIST_MAGIC = b'DRZWRD1\n'
+WORDLIST_HEADER = struct.Struct('<QQQ')
+WORDLIST_OFFSET = struct.Struct('<Q')
+KIND_DICTIONARY = 0
+KIND_TLD = 1
+KIND_NAMES = {KIND_DICTIONARY: 'dictionary', KIND_TLD: 'TLD'}
+
+
+def valid_words(lines, kind):
+    '''
+    The words of a -D or --tld text file that DNSRazzle uses: alphanumeric dictionary words or
+    alphabetic TLDs and public suffixes (co.uk), lowercased and deduplicated.
+    '''
+    if kind == KIND_TLD:
+        words = {x.lower() for x in lines}
+        return [x for x in words if all(label.isalpha() for label in x.split('.'))]
+    words = set(lines)
+    return [x for x in words if x.isalnum()]
+
+
+def compile_wordlist(source, out_path, kind=KIND_DICTIONARY):
+    '''
+    Validate and deduplicate the text word list `source` once and write it sorted to
+    `out_path` in the compiled format Wordlist.load() maps.
+    '''
+    with open(source) as f:
+        words = sorted(valid_words(f.read().splitlines(), kind))
+    blob = '\n'.join(words).encode('utf-8')
+    offsets = [0]
+    for word in words:
+        offsets.append(offsets[-1] + len(word.encode('utf-8')) + 1)
+    with open(out_path, 'wb') as f:
+        f.write(WORDLIST_MAGIC)
+        f.write(WORDLIST_HEADER.pack(len(words), len(blob), kind))
+        f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+        f.write(blob)
+    return Wordlist.load(out_path)
+
+
+class Wordlist():
+    '''
+    Read-only, sorted sequence of the words of a compiled word list, memory-mapped so every
+    razzle and worker process shares the one copy in the page cache. Pickles as its path, so
+    handing it to a process pool costs nothing.
+    '''
+    def __init__(self, path, data, count, kind, offset):
+        self.path = path
+        self.data = data
+        self.count = count
+        self.kind = kind
+        # start of the offsets table; the newline-joined words follow it
+        self.offset = offset
+        self.blob_start = offset + (count + 1) * WORDLIST_OFFSET.size
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(WORDLIST_MAGIC)] != WORDLIST_MAGIC:
+            raise ValueError(f'{path} is not a compiled dnsrazzle word list')
+        count, _, kind = WORDLIST_HEADER.unpack_from(data, len(WORDLIST_MAGIC))
+        return cls(path, data, count, kind, len(WORDLIST_MAGIC) + WORDLIST_HEADER.size)
+
+    def __reduce__(self):
+        return (Wordlist.load, (self.path,))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        start, = WORDLIST_OFFSET.unpack_from(self.data, self.offset + index * WORDLIST_OFFSET.size)
+        end, = WORDLIST_OFFSET.unpack_from(self.data, self.offset + (index + 1) * WORDLIST_OFFSET.size)
+        return self.data[self.blob_start + start:self.blob_start + end - 1].decode('utf-8')
+
+    def __iter__(self):
+        if not self.count:
+            return iter(())
+        return iter(self.data[self.blob_start:].decode('utf-8').split('\n'))
+
+    def __contains__(self, word):
+        index = bisect.bisect_left(self, word)
+        return index < self.count and self[index] == word
+
+    def close(self):
+        self.data.close()
+
+
+def is_compiled(path):
+    with open(path, 'rb') as f:
+        return f.read(len(WORDLIST_MAGIC)) == WORDLIST_MAGIC
+
+
+def load_wordlist(path, kind=KIND_DICTIONARY):
+    '''
+    The words of a -D or --tld file: a compiled Wordlist if it was built with
+    "python3 -m dnsrazzle.WordlistUtil", otherwise the validated words of the text file.
+    '''
+    if is_compiled(path):
+        wordlist = Wordlist.load(path)
+        if wordlist.kind != kind:
+            raise ValueError(f'{path} is a compiled {KIND_NAMES.get(wordlist.kind, "unknown")} list, '
+                             f'not a {KIND_NAMES[kind]} list')
+        return wordlist
+    with open(path) as f:
+        return valid_words(f.read().splitlines(), kind)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile a dictionary or TLD file for fast loading with -D or --tld.')
+    parser.add_argument('wordlist', help='Path of the compiled file to write.')
+    parser.add_argument('source', help='Text file with one word per line.')
+    parser.add_argument('--tld', action='store_true', default=False,
+                        help='Compile a TLD list for --tld rather than a dictionary for -D.')
+    arguments = parser.parse_args()
+    wordlist = compile_wordlist(arguments.source, arguments.wordlist, KIND_TLD if arguments.tld else KIND_DICTIONARY)
+    print_good(f"Wrote {len(wordlist)} words to {arguments.wordlist}")
+
+
+if __name__ == '__main__':
+    main()
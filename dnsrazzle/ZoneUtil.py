@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+ ______  __    _ _______ ______   _______ _______ _______ ___     _______
+|      ||  |  | |       |    _ | |   _   |       |       |   |   |       |
+|  _    |   |_| |  _____|   | || |  |_|  |____   |____   |   |   |    ___|
+| | |   |       | |_____|   |_||_|       |____|  |____|  |   |   |   |___
+| |_|   |  _    |_____  |    __  |       | ______| ______|   |___|    ___|
+|       | | |   |_____| |   |  | |   _   | |_____| |_____|       |   |___
+|______||_|  |__|_______|___|  |_|__| |__|_______|_______|_______|_______|
+
+
+Generate, resolve, and compare domain variations to detect typosquatting,
+phishing, and brand impersonation
+
+Copyright 2023 SecurityShrimp
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+'''
+
+
+__version__ = '1.5.4'
+__author__ = 'SecurityShrimp'
+__twitter__ = '@securityshrimp'
+__email__ = 'securityshrimp@proton.me'
+
+import argparse
+import gzip
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+from .IOUtil import print_good, print_status
+
+
+INDEX_MAGIC = b'DRZIDX1\n'
+INDEX_HEADER = struct.Struct('<QQQQ')
+OFFSET = struct.Struct('<Q')
+RUN_SIZE = 1000000
+
+record_classes = {'in', 'ch', 'hs', 'cs'}
+
+
+def open_zone(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='ascii', errors='ignore')
+    return open(path, 'r', encoding='ascii', errors='ignore')
+
+
+def read_delegations(path):
+    '''
+    Yield (origin, name) for every NS record below the zone apex in a master-format zone file,
+    such as the .com/.net dumps from CZDS. Only the owner names matter, so rdata is not parsed.
+    '''
+    origin = ''
+    owner = ''
+    in_parens = False
+    with open_zone(path) as f:
+        for line in f:
+            line = line.split(';', 1)[0]
+            if in_parens:
+                in_parens = ')' not in line
+                continue
+            if '(' in line and ')' not in line:
+                in_parens = True
+            if not line.strip():
+                continue
+            tokens = line.split()
+            if tokens[0].upper() == '$ORIGIN':
+                origin = tokens[1].lower().rstrip('.')
+                continue
+            if tokens[0].startswith('$'):
+                continue
+            if not line[0].isspace():
+                owner = tokens[0].lower()
+                tokens = tokens[1:]
+                if owner == '@':
+                    owner = origin
+                elif owner.endswith('.'):
+                    owner = owner.rstrip('.')
+                elif origin:
+                    owner = owner + '.' + origin
+            while tokens and (tokens[0].isdigit() or tokens[0].lower() in record_classes):
+                tokens = tokens[1:]
+            if not tokens:
+                continue
+            rdtype = tokens[0].lower()
+            if rdtype == 'soa' and not origin:
+                origin = owner
+            elif rdtype == 'ns' and owner != origin:
+                yield origin, owner
+
+
+def registered_name(name, origins):
+    '''
+    The name delegated from the longest zone in `origins` that `name` falls under, e.g.
+    acme.com for www.acme.com under com, or None when no zone in `origins` covers it.
+    '''
+    labels = name.lower().rstrip('.').split('.')
+    for i in range(1, len(labels)):
+        if '.'.join(labels[i:]) in origins:
+            return '.'.join(labels[i - 1:])
+    return None
+
+
+def write_run(names):
+    fd, path = tempfile.mkstemp(prefix='dnsrazzle-zone-', suffix='.run')
+    with os.fdopen(fd, 'w') as f:
+        for name in sorted(names):
+            f.write(name + '\n')
+    return path
+
+
+def build_zone_index(zone_files, out_path):
+    '''
+    Build a sorted, memory-mappable index of every name delegated in `zone_files`. Names are
+    sorted in runs of RUN_SIZE and merged from disk, so zones larger than memory can be indexed.
+    Returns the number of names written.
+    '''
+    origins = set()
+    runs = []
+    names = set()
+    try:
+        for zone_file in zone_files:
+            print_status(f"Reading delegations from {zone_file}")
+            for origin, name in read_delegations(zone_file):
+                origins.add(origin)
+                names.add(name)
+                if len(names) >= RUN_SIZE:
+                    runs.append(write_run(names))
+                    names = set()
+        runs.append(write_run(names))
+
+        files = [open(run) for run in runs]
+        offsets = []
+        with open(out_path + '.tmp', 'wb') as out:
+            origin_list = '\n'.join(sorted(origins)).encode('ascii')
+            out.write(INDEX_MAGIC)
+            out.write(INDEX_HEADER.pack(0, 0, 0, 0))
+            out.write(origin_list)
+            data_offset = out.tell()
+            previous = None
+            for line in heapq.merge(*files):
+                if line == previous:
+                    continue
+                previous = line
+                offsets.append(out.tell() - data_offset)
+                out.write(line.encode('ascii'))
+            offsets.append(out.tell() - data_offset)
+            offsets_offset = out.tell()
+            for offset in offsets:
+                out.write(OFFSET.pack(offset))
+            out.seek(len(INDEX_MAGIC))
+            out.write(INDEX_HEADER.pack(len(offsets) - 1, len(origin_list), data_offset, offsets_offset))
+        for f in files:
+            f.close()
+        os.replace(out_path + '.tmp', out_path)
+    finally:
+        for run in runs:
+            os.unlink(run)
+    return len(offsets) - 1
+
+
+class ZoneIndex():
+    '''
+    Read-only view of an index built by build_zone_index. The file is memory-mapped and searched
+    in place, so opening it is instant and it is shared between processes through the page cache.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f'{path} is not a dnsrazzle zone index')
+        self.count, origins_length, self.data_offset, self.offsets_offset = INDEX_HEADER.unpack_from(self.map, len(INDEX_MAGIC))
+        origins_start = len(INDEX_MAGIC) + INDEX_HEADER.size
+        origins = self.map[origins_start:origins_start + origins_length].decode('ascii')
+        self.origins = set(origins.split('\n')) if origins else set()
+
+    def __len__(self):
+        return self.count
+
+    def name_at(self, i):
+        start, end = struct.unpack_from('<QQ', self.map, self.offsets_offset + i * OFFSET.size)
+        return self.map[self.data_offset + start:self.data_offset + end - 1]
+
+    def __contains__(self, name):
+        key = name.encode('ascii')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < self.count and self.name_at(lo) == key
+
+    def is_delegated(self, name):
+        '''
+        True or False when `name` is under a zone in the index, None when the index cannot tell.
+        '''
+        registered = registered_name(name, self.origins)
+        if registered is None:
+            return None
+        return registered in self
+
+    def close(self):
+        self.map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a dnsrazzle zone index from zone files.')
+    parser.add_argument('index', help='Path of the index file to write.')
+    parser.add_argument('zone_files', nargs='+', metavar='ZONE_FILE', help='Zone files to read, optionally gzip compressed.')
+    arguments = parser.parse_args()
+    count = build_zone_index(arguments.zone_files, arguments.index)
+    print_good(f"Indexed {count} delegated names in {arguments.index}")
+
+
+if __name__ == '__main__':
+    main()
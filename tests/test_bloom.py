@@ -0,0 +1,33 @@
+import pytest
+from dnsrazzle.BloomUtil import BloomFilter, build_bloom_filter
+
+
+def write_zone(path):
+    path.write_text('$ORIGIN com.\n@ IN SOA ns.com. hostmaster.com. 1 1800 900 604800 86400\n'
+                    'acme NS ns1.acme\nacmf NS ns1.acmf\n')
+    return str(path)
+
+
+def test_results_are_added_as_their_registered_name(tmp_path):
+    results = tmp_path / 'discovered-domains.csv'
+    results.write_text('domain-name,fuzzer\nac.me.com,subdomain\nwww.acne.com,www prefix\nacme.org,tld-swap\n')
+    out = str(tmp_path / 'registered.bloom')
+    build_bloom_filter([write_zone(tmp_path / 'com.zone')], out, result_files=[str(results)])
+    bloom = BloomFilter.load(out)
+    try:
+        assert bloom.origins == {'com'}
+        assert bloom.is_delegated('acme.com') is True
+        assert bloom.is_delegated('ac.me.com') is True
+        assert bloom.is_delegated('www.me.com') is True
+        assert bloom.is_delegated('acne.com') is True
+        # outside the zones of the zone files, results cannot rule anything out
+        assert bloom.is_delegated('acme.org') is None
+    finally:
+        bloom.close()
+
+
+def test_covers_needs_zone_files(tmp_path):
+    results = tmp_path / 'discovered-domains.csv'
+    results.write_text('domain-name,fuzzer\nacme.com,original*\n')
+    with pytest.raises(ValueError):
+        build_bloom_filter([], str(tmp_path / 'registered.bloom'), result_files=[str(results)], covers=['com'])
@@ -0,0 +1,36 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dnsrazzle import DnsRazzle as DnsRazzleModule
+from dnsrazzle.DnsRazzle import DnsRazzle
+from dnsrazzle.IOUtil import DomainEntry
+
+
+def test_keep_domain_needs_an_answer():
+    razzle = DnsRazzle('acme.com', None, [], [], None, None, False, 1, False, False, None)
+    servfail = DomainEntry('addition', 'acmea.com')
+    servfail['dns-a'] = ['!ServFail']
+    servfail['dns-ns'] = ['!ServFail']
+    resolved = DomainEntry('addition', 'acmeb.com')
+    resolved['dns-mx'] = ['mx.acmeb.com']
+    razzle.keep_domain(servfail, True)
+    razzle.keep_domain(resolved, True)
+    assert razzle.domains == [resolved]
+
+
+def test_name_is_captured_once(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def screenshot(browser, domain, out_dir):
+        with lock:
+            calls.append(domain)
+        time.sleep(0.05)
+        return False
+    monkeypatch.setattr(DnsRazzleModule, 'screenshot_domain', screenshot)
+    razzle = DnsRazzle('acme.com', '/nonexistent', [], [], None, None, False, 1, False, False, None)
+    entries = [DomainEntry('addition', 'www.acmea.com'), DomainEntry('www prefix', 'www.acmea.com')]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for future in [executor.submit(razzle.check_domain, razzle, entry) for entry in entries]:
+            future.result()
+    assert calls == ['www.acmea.com']
@@ -0,0 +1,15 @@
+from dnsrazzle.FuzzUtil import expand_domains, rank_domain
+
+
+def test_count_matches_expanded_names():
+    tld = ['com', 'net', 'org', 'co.uk', 'de']
+    entries, scores, count = rank_domain('acme.com', [], tld)
+    assert count == len(list(expand_domains(entries, tld, scores=scores)))
+
+
+def test_count_matches_expanded_names_for_uppercase_tlds():
+    tld = ['COM', 'NET', 'ORG', 'DE']
+    entries, scores, count = rank_domain('acme.com', [], tld)
+    names = [entry['domain-name'] for entry in expand_domains(entries, tld, scores=scores)]
+    assert count == len(names) == len({name.lower() for name in names})
+
@@ -0,0 +1,47 @@
+from benchmarks.stub_dns_server import StubDnsServer
+from dnsrazzle import WireUtil
+from dnsrazzle.IOUtil import DomainEntry, ProgressSink
+from dnsrazzle.ResolverUtil import FairQueue, ResolverThread
+
+
+class RecordingServer(StubDnsServer):
+    '''
+    StubDnsServer that remembers the name of every query.
+    '''
+    def __init__(self, records):
+        StubDnsServer.__init__(self, records)
+        self.names = []
+
+    def answer(self, data, udp):
+        self.names.append(WireUtil.parse_query(data)[2])
+        return StubDnsServer.answer(self, data, udp)
+
+
+def test_fair_queue_holds_and_shares_names():
+    records = {'shared.com': {WireUtil.TYPE_NS: ['ns1.shared.com'], WireUtil.TYPE_A: ['192.0.2.1']}}
+    finished = {'a.com': [], 'b.com': []}
+    progress = ProgressSink('Resolving', 4, interactive=False, interval=3600)
+    jobs = FairQueue(progress=progress)
+    jobs.add([DomainEntry('addition', 'shared.com'), DomainEntry('addition', 'gone.com'),
+              DomainEntry('www prefix', 'www.gone.com')],
+             lambda entry, exists: finished['a.com'].append((entry, exists)), 'a.com')
+    jobs.add([DomainEntry('homoglyph', 'shared.com')],
+             lambda entry, exists: finished['b.com'].append((entry, exists)), 'b.com')
+    with RecordingServer(records) as server:
+        worker = ResolverThread(jobs, ['127.0.0.1'], port=server.port, progress=progress)
+        worker.start()
+        worker.join()
+    progress.wait()
+
+    # the www. variant of a name that does not exist is never sent
+    assert 'www.gone.com' not in server.names
+    assert jobs.skipped == 1
+    # the shared name is resolved once (NS, A, AAAA and MX) and reaches both brands
+    assert server.names.count('shared.com') == 4
+    assert jobs.duplicates == 1
+    for brand in ('a.com', 'b.com'):
+        shared = [entry for entry, exists in finished[brand] if entry['domain-name'] == 'shared.com' and exists]
+        assert len(shared) == 1
+        assert shared[0]['dns-a'] == ['192.0.2.1']
+    assert shared[0].sources == [('a.com', 'addition'), ('b.com', 'homoglyph')]
+    assert progress.completed == progress.total == 4
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+from whoisdomain import WhoisPrivateRegistry, WhoisQuotaExceeded
+from dnsrazzle import NetUtil, WhoisUtil
+from dnsrazzle.CacheUtil import WhoisCache, whois_fingerprint
+from dnsrazzle.DnsRazzle import DnsRazzle, whois_domains
+from dnsrazzle.IOUtil import DomainEntry
+from dnsrazzle.WhoisUtil import WhoisScheduler, WHOIS_RETRIES
+
+
+def resolved_razzle(*names):
+    razzle = DnsRazzle('acme.com', None, [], [], None, None, False, 1, False, False, None)
+    for name in names:
+        domain_entry = DomainEntry('addition', name)
+        domain_entry['dns-a'] = ['192.0.2.1']
+        razzle.domains.append(domain_entry)
+    return razzle
+
+
+def test_quota_throttles_the_registry(monkeypatch):
+    # keep the back-off between retries short
+    monkeypatch.setattr(WhoisUtil, 'WHOIS_RATE_INITIAL', 1000.0)
+
+    def refuse(domain, **kwargs):
+        raise WhoisQuotaExceeded('quota exceeded')
+    monkeypatch.setattr(NetUtil, 'query', refuse)
+    razzle = resolved_razzle('acmea.com')
+    scheduler = WhoisScheduler()
+    whois_domains([razzle], 1, scheduler=scheduler)
+    assert scheduler.registries['com'].throttled == 1 + WHOIS_RETRIES
+    assert 'whois-created' not in razzle.domains[0]
+
+
+def test_throttled_query_is_retried(monkeypatch):
+    monkeypatch.setattr(WhoisUtil, 'WHOIS_RATE_INITIAL', 1000.0)
+    attempts = []
+
+    def refuse_once(domain, **kwargs):
+        attempts.append(domain)
+        if len(attempts) == 1:
+            raise WhoisQuotaExceeded('quota exceeded')
+        return SimpleNamespace(creation_date=None, registrar='Acme Registrar')
+    monkeypatch.setattr(NetUtil, 'query', refuse_once)
+    razzle = resolved_razzle('acmea.com')
+    finished = []
+    whois_domains([razzle], 1, lambda: finished.append(True), scheduler=WhoisScheduler())
+    assert attempts == ['acmea.com', 'acmea.com']
+    assert len(finished) == 1
+    assert razzle.domains[0]['whois-registrar'] == 'Acme Registrar'
+
+
+def test_errors_are_not_cached(monkeypatch, tmp_path):
+    monkeypatch.setattr(WhoisUtil, 'WHOIS_RATE_INITIAL', 1000.0)
+    answers = {'acmea.com': WhoisQuotaExceeded('quota exceeded'),
+               'acmeb.com': WhoisPrivateRegistry('This tld has either no whois server'),
+               'acmec.com': None}
+
+    def answer(domain, **kwargs):
+        if isinstance(answers[domain], Exception):
+            raise answers[domain]
+        return answers[domain]
+    monkeypatch.setattr(NetUtil, 'query', answer)
+    razzle = resolved_razzle(*answers)
+    cache = WhoisCache(str(tmp_path / 'whois.db'))
+    try:
+        whois_domains([razzle], 1, cache=cache)
+        fingerprint = whois_fingerprint(razzle.domains[:1])
+        assert cache.get('acmea.com', fingerprint) is None
+        assert cache.get('acmeb.com', fingerprint) is None
+        assert cache.get('acmec.com', fingerprint) == {}
+    finally:
+        cache.close()
@@ -0,0 +1,36 @@
+from dnsrazzle.ZoneUtil import ZoneIndex, build_zone_index, read_delegations
+
+
+def write_zone(path):
+    path.write_text('$ORIGIN com.\n'
+                    '$TTL 86400\n'
+                    '@ IN SOA ns.com. hostmaster.com. (\n'
+                    '        1 1800 900 ; serial refresh retry\n'
+                    '        604800 86400 )\n'
+                    '@ IN NS a.gtld-servers.net.\n'
+                    'acme 172800 IN NS ns1.acme\n'
+                    'ACMF.com. IN NS ns1.acmf.com.\n'
+                    'acmg IN A 192.0.2.1\n'
+                    '     IN NS ns1.acmg ; owner of the line above\n'
+                    '$ORIGIN net.\n'
+                    'acme NS ns1.acme.net.\n')
+    return str(path)
+
+
+def test_read_delegations(tmp_path):
+    assert list(read_delegations(write_zone(tmp_path / 'com.zone'))) == [
+        ('com', 'acme.com'), ('com', 'acmf.com'), ('com', 'acmg.com'), ('net', 'acme.net')]
+
+
+def test_zone_index(tmp_path):
+    out = str(tmp_path / 'zones.idx')
+    assert build_zone_index([write_zone(tmp_path / 'com.zone')], out) == 4
+    index = ZoneIndex(out)
+    try:
+        assert index.origins == {'com', 'net'}
+        assert index.is_delegated('www.acme.com') is True
+        assert index.is_delegated('acme.net') is True
+        assert index.is_delegated('acmz.com') is False
+        assert index.is_delegated('acme.org') is None
+    finally:
+        index.close()